@@ -1,40 +1,389 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
-from werkzeug.utils import secure_filename
+import click
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, g, \
+    send_from_directory
+from markupsafe import Markup
+import cProfile
 import os
+import threading
+import time
+from contextlib import suppress
 from datetime import datetime
+from urllib.parse import urlencode
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.orm import joinedload
 from data_structures import LostAndFoundMatcher
-from models import db, bcrypt, User, LostItem, FoundItem
-
-app = Flask(__name__)
+from jobs import JobQueue
+from models import db, bcrypt, User, LostItem, FoundItem, MatchJob, ItemChange, QueryCounter, allocate_item_ids, \
+    add_photo_reference, release_photo_reference, bump_data_versions, data_versions, apply_sqlite_pragmas, \
+    write_transaction
+from metrics import REQUEST_SECONDS, REQUESTS, REQUEST_DB_SECONDS, REQUEST_DB_STATEMENTS, render_metrics
+from migrations import upgrade
+from photos import save_upload, make_variants, delete_photo, photo_filename, photo_digest, original_filename, \
+    VARIANTS
+from match_store import score_matches, store_matches, forget_matches, get_matches, rematch_all
+from response_cache import ResponseCache
+from item_transfer import FORMATS, format_for, open_stream, read_records, write_records, export_records, \
+    import_items
+from search import fts_query, matching_ids, search_items
+
+# INSTANCE_PATH (absolute) moves the database and other runtime files, e.g. to a scratch copy for benchmarks
+app = Flask(__name__, instance_path=os.environ.get('INSTANCE_PATH') or None)
 app.secret_key = 'your-secret-key-change-this-in-production'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['PHOTO_MAX_AGE'] = 365 * 24 * 3600  # Content-addressed photos never change
+app.config['LEGACY_PHOTO_MAX_AGE'] = 24 * 3600
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///lost_and_found.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['APP_ENV'] = os.environ.get('APP_ENV', 'development')
+# 'production' tunes SQLite for several worker processes sharing the file: WAL lets readers
+# carry on while one connection writes, and NORMAL sync is still safe from corruption in WAL mode
+app.config['DATABASE_MODE'] = os.environ.get('DATABASE_MODE', app.config['APP_ENV'])
+app.config['SQLITE_PRAGMAS'] = {'busy_timeout': 5000}  # ms to wait for another writer's lock
+if app.config['DATABASE_MODE'] == 'production':
+    app.config['SQLITE_PRAGMAS'].update({
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -16000,  # KiB of page cache per connection
+        'temp_store': 'MEMORY',
+    })
+# Connections stay open for their page cache; size the pool to the request plus worker threads
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': 5,
+    'pool_timeout': 10,
+}
+app.config['SQL_QUERY_BUDGET'] = None  # Max SQL statements per request; going over fails when TESTING
+# Outside production, a request with an X-Profile header is run under cProfile and dumped here
+app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+
+# Background match scoring
+app.config['MATCH_WORKERS'] = int(os.environ.get('MATCH_WORKERS', 2))
+app.config['MATCH_QUEUE_DEPTH'] = int(os.environ.get('MATCH_QUEUE_DEPTH', 100))
+app.config['MATCH_QUEUE_TIMEOUT'] = 2  # seconds to wait for queue space before scoring inline
+app.config['MATCH_JOB_ATTEMPTS'] = 3  # tries per scoring job before it is dropped
+app.config['MATCH_PAGE_REFRESHES'] = 30  # times a match page reloads itself while its job runs
+app.config['MATCH_BACKEND'] = os.environ.get('MATCH_BACKEND', 'exact')  # 'exact' or 'vector' (needs NumPy)
+
+# Cache of the list, match and autocomplete responses, invalidated by data version
+app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))  # entries per process, 0 = off
+app.config['RESPONSE_CACHE_SHARED'] = os.environ.get('RESPONSE_CACHE_SHARED')  # SQLite file shared by workers
 
 # Initialize extensions
 db.init_app(app)
 bcrypt.init_app(app)
 
 # Initialize the DSA system (for matching algorithm)
-matcher = LostAndFoundMatcher()
+matcher = LostAndFoundMatcher(backend=app.config['MATCH_BACKEND'])
+synced = {'change': 0}  # Last item_change row applied to the matcher
+matcher_lock = threading.RLock()  # The matcher is shared by request and worker threads
+match_jobs = JobQueue(workers=app.config['MATCH_WORKERS'], max_depth=app.config['MATCH_QUEUE_DEPTH'],
+                      name='match-scoring')
+photo_jobs = JobQueue(workers=1, max_depth=100, name='photo-variants')
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_SHARED'])
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+PAGE_SIZE = 24
+LIST_FILTERS = ('q', 'category', 'location', 'date_from', 'date_to')
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def save_photo(file):
+    """Write an uploaded photo to disk, named by its content; returns (filename, digest, size) or None"""
+    if not (file and file.filename and allowed_file(file.filename)):
+        return None
+    # allowed_file() checked the raw name; secure_filename() would drop non-ASCII names like 照片.jpg
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    return save_upload(file, app.config['UPLOAD_FOLDER'], extension)
+
+
+def reference_photo(upload):
+    """Add a reference to a saved upload in the current transaction; returns the filename to store"""
+    if upload is None:
+        return None
+    filename, digest, size = upload
+    return add_photo_reference(digest, filename, size)
+
+
+def photo_committed(upload, stored):
+    """After the commit: keep one file per content and queue the resized variants"""
+    if upload is None:
+        return
+    folder = app.config['UPLOAD_FOLDER']
+    if stored != upload[0]:
+        # Same content uploaded before under another extension: keep that file. A concurrent
+        # upload of the same content writes the same name, so it may be gone already
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(folder, upload[0]))
+    # If the queue is full the cards keep showing the original until `flask make-thumbnails`
+    photo_jobs.submit(make_variants, folder, stored, timeout=0)
+
+
+def release_photo(photo):
+    """Drop an item's reference to its photo; returns True if the files can go once committed"""
+    digest = photo_digest(photo)
+    if digest is None:
+        return True  # Photos saved before content addressing belong to a single item
+    return release_photo_reference(digest)
+
+
+@app.template_global()
+def photo_url(photo, variant=None):
+    """URL of an uploaded photo, or of its resized variant"""
+    return url_for('serve_photo', filename=photo_filename(photo, variant))
+
+
+def cached(route, depends_on, compute):
+    """compute() for this request, or its cached value if the data it depends on is unchanged
+    
+    depends_on names the data versions ('lost', 'found', 'matches') the value is built from.
+    The value must not depend on the session; per-user parts are added by the page itself.
+    """
+    if not response_cache.enabled:
+        return compute()
+    versions = g.get('data_versions')
+    if versions is None:
+        versions = g.data_versions = data_versions()
+    return response_cache.get_or_compute(route, [versions.get(name, 0) for name in depends_on], request.path,
+                                         request.args.items(multi=True), compute)
+
+
+def encode_cursor(item):
+    return f"{item.created_at.isoformat()}_{item.id}"
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor string, or None if it is missing or malformed"""
+    created_at, _, item_pk = cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(created_at), int(item_pk)
+    except ValueError:
+        return None
+
+
+def list_filters(args):
+    return {name: args.get(name, '').strip() for name in LIST_FILTERS}
+
+
+def list_page(model, args):
+    """One page of items, newest first, filtered on the server and paged with a (created_at, id) keyset"""
+    filters = list_filters(args)
+    query = model.query.options(joinedload(model.reporter))
+    if filters['category']:
+        query = query.filter(model.category == filters['category'])
+    if filters['location']:
+        query = query.filter(model.location.icontains(filters['location'], autoescape=True))
+    if filters['date_from']:
+        query = query.filter(model.date >= filters['date_from'])
+    if filters['date_to']:
+        query = query.filter(model.date <= filters['date_to'])
+    if filters['q']:
+        if fts_query(filters['q']):
+            query = query.filter(model.id.in_(matching_ids(model, filters['q'])))
+        else:
+            # Nothing indexable (only punctuation, say), so fall back to a substring match
+            query = query.filter(or_(model.name.icontains(filters['q'], autoescape=True),
+                                     model.desc.icontains(filters['q'], autoescape=True)))
+    
+    # Seek past the last item of the previous page instead of using OFFSET
+    cursor = decode_cursor(args.get('cursor', ''))
+    if cursor:
+        created_at, item_pk = cursor
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, item_pk))
+    
+    items = query.order_by(model.created_at.desc(), model.id.desc()).limit(PAGE_SIZE + 1).all()
+    next_cursor = encode_cursor(items[PAGE_SIZE - 1]) if len(items) > PAGE_SIZE else None
+    return items[:PAGE_SIZE], next_cursor, filters
+
+
+def item_list_fragment(model, item_type):
+    """The cached part of a list page: its rendered cards, next cursor and category options"""
+    items, next_cursor, _ = list_page(model, request.args)
+    categories = db.session.query(model.category).distinct().all()
+    return {
+        'cards': render_template('_item_cards.html', items=items, item_type=item_type),
+        'next_cursor': next_cursor,
+        'categories': [c[0] for c in categories],
+    }
+
+
+def render_item_list(template, model, item_type):
+    fragment = cached('item_list', (item_type,), lambda: item_list_fragment(model, item_type))
+    filters = list_filters(request.args)
+    return render_template(template, cards=Markup(fragment['cards']), categories=fragment['categories'],
+                           filters=filters, next_cursor=fragment['next_cursor'], item_type=item_type,
+                           query_string=urlencode({name: value for name, value in filters.items() if value}))
+
+
+def add_to_matcher(item, is_lost, user_name, index_name=True):
+    """Mirror a database item into the in-memory matcher"""
+    add = matcher.add_lost_item if is_lost else matcher.add_found_item
+    add(item.name, item.desc, item.category, item.location, item.date, user_name, item.photo,
+        item_id=item.item_id, index_name=index_name)
+
+
+def load_matcher(model, is_lost, filter_by=None, index_names=True):
+    """Mirror database items of one side (optionally filtered) into the matcher"""
+    rows = db.session.query(model, User.name).join(User, model.user_id == User.id)
+    if filter_by is not None:
+        rows = rows.filter(filter_by)
+    for item, user_name in rows.order_by(model.id):
+        add_to_matcher(item, is_lost, user_name, index_name=index_names)
+
+
+def sync_matcher(index_names=True):
+    """Pick up items reported, changed or deleted since the last sync, by any worker process
+    
+    The item_change log is read on from the last row applied, so a sync with nothing new is
+    one indexed query. index_names=False leaves the tries alone, for bulk loads that rebuild
+    them afterwards.
+    """
+    since = synced['change']
+    changes = db.session.query(ItemChange.id, ItemChange.item_id, ItemChange.is_lost) \
+        .filter(ItemChange.id > since).order_by(ItemChange.id).all()
+    if not changes:
+        return
+    last = changes[-1].id
+    for model, is_lost in ((LostItem, True), (FoundItem, False)):
+        changed = {item_id for _, item_id, change_is_lost in changes if change_is_lost == is_lost}
+        if not changed:
+            continue
+        # Drop the mirrored copies, then load whatever of those items is still in the database
+        items = matcher.lost_items if is_lost else matcher.found_items
+        remove = matcher.remove_lost_item if is_lost else matcher.remove_found_item
+        for item_id in changed & items.keys():
+            remove(item_id)
+        logged = select(ItemChange.item_id).where(ItemChange.id > since, ItemChange.id <= last,
+                                                  ItemChange.is_lost == is_lost)
+        load_matcher(model, is_lost, model.item_id.in_(logged), index_names=index_names)
+    synced['change'] = last
+
+
+def score_new_item(item_id, is_lost):
+    """Job: score a newly reported item and store its matches
+    
+    A failed attempt (e.g. the database stayed busy) is retried a few times; after the last
+    one the job is dropped, so the item's page stops waiting and shows what is stored.
+    `flask rematch` fills in the missing matches later.
+    """
+    attempts = app.config['MATCH_JOB_ATTEMPTS']
+    with app.app_context():
+        for attempt in range(attempts):
+            try:
+                with matcher_lock:
+                    sync_matcher()
+                    rows = score_matches(matcher, item_id, is_lost)
+                
+                def store():
+                    # Committed with the matches, so no page sees the job done before its matches are stored
+                    MatchJob.query.filter_by(item_id=item_id).delete()
+                    store_matches(rows)
+                write_transaction(store)
+                return
+            except Exception:
+                db.session.rollback()
+                if attempt == attempts - 1:
+                    app.logger.exception("Scoring %s failed %d times, dropping the job", item_id, attempts)
+                    break
+                app.logger.warning("Scoring %s failed, retrying", item_id, exc_info=True)
+                time.sleep(0.5 * 2 ** attempt)
+        
+        def drop_job():
+            MatchJob.query.filter_by(item_id=item_id).delete()
+            bump_data_versions('matches')
+            db.session.commit()
+        write_transaction(drop_job)
+
+
+def enqueue_scoring(item_id, is_lost):
+    """Hand a new item to the scoring workers, or score it here if the queue stays full"""
+    if not match_jobs.submit(score_new_item, item_id, is_lost, timeout=app.config['MATCH_QUEUE_TIMEOUT']):
+        score_new_item(item_id, is_lost)
+
+
+@app.before_request
+def start_query_count():
+    g.request_started = time.perf_counter()
+    g.query_counter = QueryCounter()
+    g.query_counter.start()
+    if request.headers.get('X-Profile') and app.config['APP_ENV'] != 'production':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def check_query_budget(response):
+    """Enforce SQL_QUERY_BUDGET so N+1 query regressions show up in tests"""
+    counter = g.get('query_counter')
+    if counter is None:
+        return response
+    statements = counter.statements
+    budget = app.config['SQL_QUERY_BUDGET']
+    if budget is not None and len(statements) > budget:
+        message = f"{request.endpoint} ran {len(statements)} SQL statements (budget {budget})"
+        if app.testing:
+            raise AssertionError(message)
+        app.logger.warning(message)
+    return response
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Request latency, status and SQL use per endpoint, plus the optional profile dump"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        path = os.path.join(app.config['PROFILE_DIR'],
+                            f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{request.endpoint}.prof")
+        profiler.dump_stats(path)
+        response.headers['X-Profile-File'] = path
+    
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unknown'
+    REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    counter = g.get('query_counter')
+    if counter is not None:
+        REQUEST_DB_SECONDS.labels(endpoint).observe(counter.seconds)
+        REQUEST_DB_STATEMENTS.labels(endpoint).observe(len(counter.statements))
+    return response
+
+
+@app.teardown_request
+def stop_query_count(error=None):
+    """Stop the request's query counter and profiler, also when the view raised"""
+    counter = g.pop('query_counter', None)
+    if counter is not None:
+        counter.stop()
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
 # Create database tables
 with app.app_context():
+    apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    first_run = not db.inspect(db.engine).has_table('item_match')
     db.create_all()
     
+    # Upgrade databases created by older versions in place
+    with db.engine.begin() as connection:
+        for version in upgrade(connection):
+            print(f"Database upgraded to schema version {version}")
+    
     # Create default admin user if doesn't exist
     if not User.query.filter_by(username='admin').first():
         admin = User(username='admin', name='Admin User', email='admin@campus.edu')
@@ -42,6 +391,18 @@ with app.app_context():
         db.session.add(admin)
         db.session.commit()
         print("Default admin user created (username: admin, password: admin123)")
+    
+    # Warm-load the matcher, then build the autocomplete tries in one bulk pass.
+    # Changes logged from here on are applied again by sync_matcher(), which is harmless
+    synced['change'] = db.session.query(func.max(ItemChange.id)).scalar() or 0
+    for model, is_lost in ((LostItem, True), (FoundItem, False)):
+        load_matcher(model, is_lost, index_names=False)
+    matcher.rebuild_tries()
+    
+    # Filling the match table is left to `flask rematch`: every worker process runs this block,
+    # and scoring a large catalog takes far longer than a worker may take to start
+    if first_run and (LostItem.query.first() or FoundItem.query.first()):
+        print("No matches are stored yet; run `flask rematch` to score the existing items")
 
 
 @app.route('/')
@@ -104,20 +465,42 @@ def logout():
 
 @app.route('/lost')
 def lost_items():
-    """Display all lost items"""
-    items = LostItem.query.order_by(LostItem.created_at.desc()).all()
-    categories = db.session.query(LostItem.category).distinct().all()
-    categories = [c[0] for c in categories]
-    return render_template('lost_items.html', items=items, categories=categories)
+    """Display lost items, one page at a time"""
+    return render_item_list('lost_items.html', LostItem, 'lost')
 
 
 @app.route('/found')
 def found_items():
-    """Display all found items"""
-    items = FoundItem.query.order_by(FoundItem.created_at.desc()).all()
-    categories = db.session.query(FoundItem.category).distinct().all()
-    categories = [c[0] for c in categories]
-    return render_template('found_items.html', items=items, categories=categories)
+    """Display found items, one page at a time"""
+    return render_item_list('found_items.html', FoundItem, 'found')
+
+
+@app.route('/api/items/<item_type>')
+def api_items(item_type):
+    """API endpoint for infinite scroll: the next page of items as JSON and rendered cards"""
+    if item_type not in ('lost', 'found'):
+        return jsonify({'error': 'Unknown item type'}), 404
+    model = LostItem if item_type == 'lost' else FoundItem
+    return jsonify(cached('api_items', (item_type,), lambda: items_page_payload(model, item_type)))
+
+
+def items_page_payload(model, item_type):
+    items, next_cursor, _ = list_page(model, request.args)
+    return {
+        'items': [{
+            'item_id': item.item_id,
+            'name': item.name,
+            'desc': item.desc,
+            'category': item.category,
+            'location': item.location,
+            'date': item.date,
+            'photo': item.photo,
+            'reporter': item.reporter.name,
+        } for item in items],
+        'html': render_template('_item_cards.html', items=items, item_type=item_type),
+        'next_cursor': next_cursor,
+    }
+
 
 @app.route('/report-lost', methods=['GET', 'POST'])
 def report_lost():
@@ -134,33 +517,35 @@ def report_lost():
         date = request.form.get('date')
         user_id = session.get('user_id')
         
-        # Handle file upload
-        photo = None
-        if 'photo' in request.files:
-            file = request.files['photo']
-            if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                photo = filename
+        # Handle file upload (written to disk once, outside the retried transaction)
+        upload = save_photo(request.files.get('photo'))
         
-        # Generate item ID
-        count = LostItem.query.count() + 1
-        item_id = f"L{count:03d}"
+        def create_item():
+            photo = reference_photo(upload)
+            
+            # Generate item ID (committed with the item below)
+            item_id = allocate_item_ids('L')[0]
+            
+            # Create database entry
+            lost_item = LostItem(
+                item_id=item_id,
+                name=name,
+                desc=desc,
+                category=category,
+                location=location,
+                date=date,
+                photo=photo,
+                user_id=user_id
+            )
+            db.session.add(lost_item)
+            db.session.add(MatchJob(item_id=item_id, is_lost=True))
+            bump_data_versions('lost')
+            db.session.commit()
+            return item_id, photo
         
-        # Create database entry
-        lost_item = LostItem(
-            item_id=item_id,
-            name=name,
-            desc=desc,
-            category=category,
-            location=location,
-            date=date,
-            photo=photo,
-            user_id=user_id
-        )
-        db.session.add(lost_item)
-        db.session.commit()
+        item_id, photo = write_transaction(create_item)
+        photo_committed(upload, photo)
+        enqueue_scoring(item_id, True)
         
         flash(f'Lost item {item_id} reported successfully!', 'success')
         return redirect(url_for('lost_items'))
@@ -182,33 +567,35 @@ def report_found():
         date = request.form.get('date')
         user_id = session.get('user_id')
         
-        # Handle file upload
-        photo = None
-        if 'photo' in request.files:
-            file = request.files['photo']
-            if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                photo = filename
+        # Handle file upload (written to disk once, outside the retried transaction)
+        upload = save_photo(request.files.get('photo'))
         
-        # Generate item ID
-        count = FoundItem.query.count() + 1
-        item_id = f"F{count:03d}"
+        def create_item():
+            photo = reference_photo(upload)
+            
+            # Generate item ID (committed with the item below)
+            item_id = allocate_item_ids('F')[0]
+            
+            # Create database entry
+            found_item = FoundItem(
+                item_id=item_id,
+                name=name,
+                desc=desc,
+                category=category,
+                location=location,
+                date=date,
+                photo=photo,
+                user_id=user_id
+            )
+            db.session.add(found_item)
+            db.session.add(MatchJob(item_id=item_id, is_lost=False))
+            bump_data_versions('found')
+            db.session.commit()
+            return item_id, photo
         
-        # Create database entry
-        found_item = FoundItem(
-            item_id=item_id,
-            name=name,
-            desc=desc,
-            category=category,
-            location=location,
-            date=date,
-            photo=photo,
-            user_id=user_id
-        )
-        db.session.add(found_item)
-        db.session.commit()
+        item_id, photo = write_transaction(create_item)
+        photo_committed(upload, photo)
+        enqueue_scoring(item_id, False)
         
         flash(f'Found item {item_id} reported successfully!', 'success')
         return redirect(url_for('found_items'))
@@ -219,83 +606,92 @@ def report_found():
 def view_matches(item_id, item_type):
     """View matches for an item"""
     is_lost = (item_type == 'lost')
-    
-    # Get the original item from DATABASE
-    if is_lost:
-        item = LostItem.query.filter_by(item_id=item_id).first()
-    else:
-        item = FoundItem.query.filter_by(item_id=item_id).first()
+    fragment = cached('matches', ('lost', 'found', 'matches'), lambda: matches_fragment(item_id, item_type))
     
     # Check if item exists
-    if not item:
+    if fragment is False:
         flash('Item not found. Please try again.', 'error')
         if is_lost:
             return redirect(url_for('lost_items'))
         else:
             return redirect(url_for('found_items'))
     
-    # Get opposite items for matching
+    return render_template('matches.html', fragment=Markup(fragment))
+
+
+def matches_fragment(item_id, item_type):
+    """The rendered match list of an item, or False if there is no such item"""
+    is_lost = (item_type == 'lost')
+    
+    # Get the original item from DATABASE
     if is_lost:
-        target_items = FoundItem.query.all()
+        item = LostItem.query.filter_by(item_id=item_id).first()
     else:
-        target_items = LostItem.query.all()
+        item = FoundItem.query.filter_by(item_id=item_id).first()
+    if not item:
+        return False
     
-    # Calculate matches
+    # Read the precomputed top matches, unless a worker is still computing them
+    computing = MatchJob.query.filter_by(item_id=item_id).first() is not None
     matches = []
-    for target_item in target_items:
-        # Calculate similarity score
-        score = 0
-        
-        # Name similarity (40%)
-        from difflib import SequenceMatcher
-        name_sim = SequenceMatcher(None, item.name.lower(), target_item.name.lower()).ratio()
-        score += name_sim * 40
-        
-        # Description similarity (20%)
-        desc_sim = SequenceMatcher(None, item.desc.lower(), target_item.desc.lower()).ratio()
-        score += desc_sim * 20
-        
-        # Category match (20%)
-        if item.category.lower() == target_item.category.lower():
-            score += 20
-        
-        # Location match (15%)
-        if item.location.lower() == target_item.location.lower():
-            score += 15
-        
-        # Date proximity (5%)
-        try:
-            from datetime import datetime
-            date1 = datetime.strptime(item.date, '%Y-%m-%d')
-            date2 = datetime.strptime(target_item.date, '%Y-%m-%d')
-            days_diff = abs((date1 - date2).days)
-            if days_diff <= 7:
-                score += 5 * (1 - days_diff / 7)
-        except:
-            pass
-        
-        # Add to matches if score is above threshold
-        if score >= 30:
-            matches.append({
-                'item': target_item,
-                'score': int(score)
-            })
-    
-    # Sort by score descending
-    matches.sort(key=lambda x: x['score'], reverse=True)
+    if not computing:
+        matches = [{'item': match_item, 'score': score} for match_item, score in get_matches(item_id, is_lost)]
     
-    return render_template('matches.html', 
+    # The page reloads itself while the job runs, counting in ?refresh= so it gives up eventually
+    return render_template('_matches.html', 
                          item=item, 
-                         matches=matches[:10],  # Top 10 matches
-                         item_type=item_type)
+                         matches=matches,  # Top 10 matches
+                         item_type=item_type,
+                         computing=computing,
+                         refreshes=request.args.get('refresh', 0, type=int),
+                         max_refreshes=app.config['MATCH_PAGE_REFRESHES'])
+
+@app.route('/api/search')
+def api_search():
+    """API endpoint for full-text search: BM25-ranked items with matched terms highlighted"""
+    item_type = request.args.get('type', 'lost')
+    if item_type not in ('lost', 'found'):
+        return jsonify({'error': 'Unknown item type'}), 404
+    model = LostItem if item_type == 'lost' else FoundItem
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_more = search_items(model, request.args.get('q', ''), page)
+    return jsonify({
+        'items': [{
+            'item_id': result['item'].item_id,
+            'name': result['item'].name,
+            'desc': result['item'].desc,
+            'category': result['item'].category,
+            'location': result['item'].location,
+            'date': result['item'].date,
+            'photo': result['item'].photo,
+            'reporter': result['item'].reporter.name,
+            'name_html': result['name'],
+            'desc_html': result['desc'],
+            'rank': result['rank'],
+        } for result in results],
+        'page': page,
+        'next_page': page + 1 if has_more else None,
+    })
 
 @app.route('/api/autocomplete')
 def autocomplete():
     """API endpoint for autocomplete"""
     prefix = request.args.get('prefix', '')
     item_type = request.args.get('type', 'lost')
+    fuzzy = request.args.get('fuzzy') == '1'
+    
+    # Pick up names reported through other worker processes. If a scoring job has the matcher,
+    # it syncs it itself, and this request answers from the tries as they are rather than wait
+    if matcher_lock.acquire(blocking=False):
+        try:
+            sync_matcher()
+        finally:
+            matcher_lock.release()
     
-    suggestions = matcher.get_autocomplete_suggestions(prefix, item_type)
+    # The tries live in this process, so their own version keys the cache instead of the database's
+    suggestions = response_cache.get_or_compute(
+        'autocomplete', [matcher.trie_version], request.path, request.args.items(multi=True),
+        lambda: matcher.get_autocomplete_suggestions(prefix, item_type, fuzzy=fuzzy), shared=False)
     return jsonify(suggestions)
 
 @app.route('/profile')
@@ -340,14 +736,25 @@ def delete_lost(item_id):
         flash('You can only delete your own items', 'error')
         return redirect(url_for('lost_items'))
     
-    # Delete photo if exists
-    if item.photo:
-        photo_path = os.path.join(app.config['UPLOAD_FOLDER'], item.photo)
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
+    photo = item.photo
     
-    db.session.delete(item)
-    db.session.commit()
+    def remove_item():
+        if not LostItem.query.filter_by(item_id=item_id).delete():
+            db.session.rollback()
+            return False  # Another request deleted it first and released its photo
+        # Delete the photo once no other item uses it
+        photo_unused = photo and release_photo(photo)
+        MatchJob.query.filter_by(item_id=item_id).delete()
+        bump_data_versions('lost')
+        db.session.commit()
+        return photo_unused
+    
+    if write_transaction(remove_item):
+        delete_photo(app.config['UPLOAD_FOLDER'], photo)
+    with matcher_lock:
+        matcher.remove_lost_item(item_id)
+        sync_matcher()
+        write_transaction(lambda: forget_matches(matcher, item_id, True))
     
     flash(f'Lost item {item_id} deleted successfully!', 'success')
     return redirect(url_for('lost_items'))
@@ -371,18 +778,55 @@ def delete_found(item_id):
         flash('You can only delete your own items', 'error')
         return redirect(url_for('found_items'))
     
-    # Delete photo if exists
-    if item.photo:
-        photo_path = os.path.join(app.config['UPLOAD_FOLDER'], item.photo)
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
+    photo = item.photo
     
-    db.session.delete(item)
-    db.session.commit()
+    def remove_item():
+        if not FoundItem.query.filter_by(item_id=item_id).delete():
+            db.session.rollback()
+            return False  # Another request deleted it first and released its photo
+        # Delete the photo once no other item uses it
+        photo_unused = photo and release_photo(photo)
+        MatchJob.query.filter_by(item_id=item_id).delete()
+        bump_data_versions('found')
+        db.session.commit()
+        return photo_unused
+    
+    if write_transaction(remove_item):
+        delete_photo(app.config['UPLOAD_FOLDER'], photo)
+    with matcher_lock:
+        matcher.remove_found_item(item_id)
+        sync_matcher()
+        write_transaction(lambda: forget_matches(matcher, item_id, False))
     
     flash(f'Found item {item_id} deleted successfully!', 'success')
     return redirect(url_for('found_items'))
 
+@app.route('/photos/<path:filename>')
+def serve_photo(filename):
+    """Uploaded photos and their variants; content-addressed ones are cached for good"""
+    folder = app.config['UPLOAD_FOLDER']
+    if os.path.dirname(filename) in VARIANTS and not os.path.isfile(os.path.join(folder, filename)):
+        # The variant is not made yet: send the original, but never cached under the variant's URL
+        original = original_filename(folder, filename, ALLOWED_EXTENSIONS)
+        if original:
+            return send_from_directory(folder, original, max_age=0)
+    digest = photo_digest(os.path.basename(filename))
+    if digest is None:
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=app.config['LEGACY_PHOTO_MAX_AGE'])
+    # The name is the content hash, so it doubles as a strong ETag that never goes stale
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=app.config['PHOTO_MAX_AGE'],
+                                   etag=f"{digest}-{os.path.dirname(filename) or 'original'}")
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of this process"""
+    return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 @app.route('/contact')
 def contact():
     """Contact/Customer Support page"""
@@ -406,6 +850,103 @@ def about():
     """About Us page"""
     return render_template('about.html')
 
+
+@app.cli.command('rematch')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: one per core).')
+@click.option('--chunk-size', type=int, default=64, help='Lost items per job.')
+@click.option('--batch-size', type=int, default=5000, help='Match rows per insert transaction.')
+def rematch_command(workers, chunk_size, batch_size):
+    """Rescore every lost x found pair and rewrite the match table"""
+    def progress(pairs, elapsed):
+        click.echo(f"\r{pairs:,} pairs scored ({pairs / max(elapsed, 1e-9):,.0f} pairs/sec)", nl=False)
+    
+    with matcher_lock:
+        sync_matcher()
+        pairs, elapsed = rematch_all(matcher, workers, chunk_size, batch_size, progress=progress)
+    click.echo(f"\nRescored {pairs:,} pairs in {elapsed:.1f}s ({pairs / max(elapsed, 1e-9):,.0f} pairs/sec)")
+
+
+@app.cli.command('resume-matches')
+def resume_matches_command():
+    """Score the items whose match jobs a previous run left unfinished
+    
+    Run it once after a crash or restart, e.g. in the deploy step; the web workers do not
+    resume jobs themselves, since each would pick up the same ones.
+    """
+    jobs = [(job.item_id, job.is_lost) for job in MatchJob.query.order_by(MatchJob.id)]
+    for item_id, is_lost in jobs:
+        score_new_item(item_id, is_lost)
+    click.echo(f"Scored {len(jobs)} unfinished match jobs")
+
+
+@app.cli.command('make-thumbnails')
+def make_thumbnails_command():
+    """Make any missing resized variants of uploaded photos"""
+    photos = [photo for model in (LostItem, FoundItem)
+              for (photo,) in db.session.query(model.photo).filter(model.photo.isnot(None))]
+    for photo in photos:
+        make_variants(app.config['UPLOAD_FOLDER'], photo)
+    click.echo(f"Checked variants of {len(photos)} photos")
+
+
+
+@app.cli.command('import-items')
+@click.argument('item_type', type=click.Choice(['lost', 'found']))
+@click.argument('path', type=click.Path(allow_dash=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), default=None,
+              help='Input format (default: from the file extension, else csv).')
+@click.option('--user', 'username', default='admin', help='Reporter for rows without a known reporter username.')
+@click.option('--chunk-size', type=int, default=1000, help='Items per insert transaction.')
+@click.option('--rematch/--no-rematch', default=True,
+              help='Rescore all matches afterwards (use --no-rematch for all but the last of several imports).')
+@click.option('--workers', type=int, default=None, help='Rematch worker processes (default: one per core).')
+def import_items_command(item_type, path, file_format, username, chunk_size, rematch, workers):
+    """Bulk-import items from CSV or JSON Lines
+    
+    Columns: name, desc, category, location, date (YYYY-MM-DD), and optionally reporter
+    (a username) and created_at. Items get new IDs. Rows that cannot be imported are
+    reported and skipped.
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.UsageError(f"No user named {username!r}")
+    model = LostItem if item_type == 'lost' else FoundItem
+    
+    def skipped(number, problem):
+        click.echo(f"\rSkipped record {number}: {problem}", err=True)
+    
+    def progress(imported, skipped_count):
+        click.echo(f"\r{imported:,} imported, {skipped_count:,} skipped", nl=False)
+    
+    started = time.perf_counter()
+    with open_stream(path, 'r') as stream:
+        imported, skipped_count = import_items(model, read_records(stream, file_format or format_for(path)),
+                                               user.id, chunk_size, on_skip=skipped, progress=progress)
+    click.echo(f"\nImported {imported:,} {item_type} items in {time.perf_counter() - started:.1f}s "
+               f"({skipped_count:,} skipped)")
+    
+    # The per-item work of reporting is done once for the whole import
+    with matcher_lock:
+        sync_matcher(index_names=False)
+        matcher.rebuild_tries()
+        if rematch and imported:
+            pairs, elapsed = rematch_all(matcher, workers)
+            click.echo(f"Rescored {pairs:,} pairs in {elapsed:.1f}s")
+
+
+@app.cli.command('export-items')
+@click.argument('item_type', type=click.Choice(['lost', 'found']))
+@click.argument('path', type=click.Path(allow_dash=True, dir_okay=False), default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), default=None,
+              help='Output format (default: from the file extension, else csv).')
+def export_items_command(item_type, path, file_format):
+    """Stream every lost or found item to CSV or JSON Lines (stdout by default)"""
+    model = LostItem if item_type == 'lost' else FoundItem
+    with open_stream(path, 'w') as stream:
+        count = write_records(export_records(model), stream, file_format or format_for(path))
+    click.echo(f"Exported {count:,} {item_type} items", err=True)
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
 
@@ -0,0 +1 @@
+"""Benchmarks for the Campus Lost & Found app (run from the campus-lost-found folder)"""
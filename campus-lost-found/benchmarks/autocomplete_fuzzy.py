@@ -0,0 +1,71 @@
+"""Per-keystroke latency of exact and typo-tolerant autocomplete
+
+    python -m benchmarks.autocomplete_fuzzy [--words 100000] [--queries 500]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_structures import Trie  # noqa: E402
+
+SYLLABLES = ['ba', 'ck', 'pa', 'ph', 'one', 'key', 'wal', 'let', 'um', 'bre', 'lla', 'note', 'bo',
+             'ok', 'cal', 'cu', 'la', 'tor', 'jac', 'ket', 'bot', 'tle', 'ca', 'rd', 'lap', 'top']
+
+
+def vocabulary(words):
+    random.seed(13)
+    counts = {}
+    while len(counts) < words:
+        word = ''.join(random.choice(SYLLABLES) for _ in range(random.randint(2, 5)))
+        counts[word] = random.randint(1, 50)
+    return counts
+
+
+def typo(word):
+    """One random substitution, deletion, insertion or transposition"""
+    i = random.randrange(len(word))
+    kind = random.randrange(4)
+    if kind == 0:
+        return word[:i] + random.choice(string.ascii_lowercase) + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1:]
+    if kind == 2:
+        return word[:i] + random.choice(string.ascii_lowercase) + word[i:]
+    if i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def measure(label, search, queries):
+    started = time.perf_counter()
+    hits = 0
+    for query in queries:
+        hits += bool(search(query))
+    elapsed = (time.perf_counter() - started) / len(queries) * 1000
+    print(f"{label:32} {elapsed:8.3f} ms/query   {hits / len(queries):6.1%} with suggestions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=100000, help='vocabulary size')
+    parser.add_argument('--queries', type=int, default=500, help='prefixes per run')
+    args = parser.parse_args()
+
+    counts = vocabulary(args.words)
+    trie = Trie.from_counts(counts.items())
+    words = list(counts)
+    print(f"{len(trie):,} words")
+    for length in (3, 5, 8):
+        prefixes = [word[:length] for word in random.sample(words, args.queries)]
+        typos = [typo(prefix) for prefix in prefixes]
+        measure(f"exact, {length} chars", trie.search_prefix, prefixes)
+        measure(f"exact with typo, {length} chars", trie.search_prefix, typos)
+        measure(f"fuzzy with typo, {length} chars", trie.search_fuzzy, typos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Seeded generator of realistic lost and found items
+
+The same seed always gives the same catalog, so runs on different commits measure the
+same data. Lost and found items are drawn from the same pool of real-world objects, and a
+share of found items are noisy copies of lost ones, so matching has true pairs to find.
+"""
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+LOCATIONS = ['Library', 'Cafeteria', 'Gym', 'Classroom Building A', 'Classroom Building B',
+             'Parking Lot', 'Sports Complex', 'Dormitory']
+
+# category -> (object names, brands or kinds)
+OBJECTS = {
+    'Phone': (['phone', 'smartphone', 'mobile phone'], ['iPhone 13', 'iPhone 15 Pro', 'Samsung Galaxy S23',
+                                                        'Pixel 8', 'Redmi Note 12', 'Oppo A78']),
+    'Wallet': (['wallet', 'purse', 'card holder'], ['leather', 'Fossil', 'canvas', 'Herschel', 'zip']),
+    'Keys': (['keys', 'key ring', 'car key', 'dorm key'], ['Toyota', 'Honda', 'room 214', 'locker', 'bike']),
+    'Bag': (['backpack', 'tote bag', 'sling bag', 'laptop bag'], ['JanSport', 'Nike', 'North Face', 'Adidas']),
+    'Laptop': (['laptop', 'notebook computer', 'MacBook'], ['MacBook Air', 'Dell XPS', 'Lenovo ThinkPad',
+                                                           'HP Pavilion', 'Asus Zenbook']),
+    'Electronics': (['earbuds', 'charger', 'power bank', 'calculator', 'headphones', 'USB drive'],
+                    ['AirPods', 'Anker', 'Casio fx-991', 'Sony', 'JBL', 'SanDisk']),
+    'ID': (['student ID', 'ID card', 'library card'], ['student', 'staff', 'visitor']),
+    'Clothing': (['jacket', 'hoodie', 'cap', 'scarf', 'umbrella'], ['varsity', 'Uniqlo', 'denim', 'wool']),
+    'Bottle': (['water bottle', 'tumbler', 'flask'], ['Hydro Flask', 'Stanley', 'Aquaflask', 'Tupperware']),
+    'Books': (['textbook', 'notebook', 'planner', 'binder'], ['Calculus', 'Physics', 'Biology', 'Accounting']),
+}
+COLORS = ['black', 'white', 'blue', 'red', 'green', 'gray', 'pink', 'silver', 'brown', 'navy', 'yellow']
+DETAILS = ['with a cracked screen', 'with a sticker on the back', 'in a clear case', 'with my initials on it',
+           'with a keychain attached', 'slightly scratched', 'brand new', 'with a name tag', 'with a torn strap',
+           'with some cash inside', 'with a blue lanyard', 'missing a cap', 'with a university logo']
+PLACES = ['near the entrance', 'under a table', 'on a bench', 'by the vending machines', 'in the restroom',
+          'at the front desk', 'beside the stairs', 'in the bleachers', 'on the second floor']
+
+
+def _typo(text, rng):
+    """One random slip of the kind people make when typing a report"""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return text[:i] + text[i + 1:]
+    if kind == 1:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice('aeiou') + text[i + 1:]
+
+
+def _new_item(rng, start, date_spread):
+    category = rng.choice(list(OBJECTS))
+    names, kinds = OBJECTS[category]
+    color = rng.choice(COLORS)
+    kind = rng.choice(kinds)
+    noun = rng.choice(names)
+    name = rng.choice([f"{color.title()} {kind}", f"{kind} {noun}", f"{color} {noun}", kind]).strip()
+    details = rng.sample(DETAILS, rng.randint(1, 3))
+    desc = f"{color.title()} {kind} {noun} {', '.join(details)}. Last seen {rng.choice(PLACES)}."
+    return {
+        'name': name,
+        'desc': desc,
+        'category': category,
+        'location': rng.choice(LOCATIONS),
+        'date': (start + timedelta(days=rng.randrange(date_spread))).isoformat(),
+    }
+
+
+def generate_items(count, seed=7, side='lost', date_spread=180, start=date(2025, 1, 1), pair_share=0.3):
+    """Yield count item dicts (name, desc, category, location, date, user) for one side
+
+    For side='found', pair_share of the items are re-reports of the lost item at the same
+    position (generate_items(count, seed, 'lost')): a few days later, maybe elsewhere on
+    campus, with a typo or a shorter description. Generation streams, so a million items
+    never have to be held at once.
+    """
+    lost_rng = random.Random(f"{seed}-lost")
+    rng = lost_rng if side == 'lost' else random.Random(f"{seed}-{side}")
+    user_rng = random.Random(f"{seed}-{side}-users")
+    for _ in range(count):
+        lost_item = _new_item(lost_rng, start, date_spread) if side != 'lost' else None
+        if side == 'lost':
+            item = _new_item(rng, start, date_spread)
+        elif rng.random() < pair_share:
+            item = dict(lost_item)
+            if rng.random() < 0.5:
+                item['name'] = _typo(item['name'], rng)
+            if rng.random() < 0.5:
+                item['desc'] = item['desc'].split(',')[0] + '.'
+            if rng.random() < 0.3:
+                item['location'] = rng.choice(LOCATIONS)
+            found_on = date.fromisoformat(item['date']) + timedelta(days=rng.randint(0, 10))
+            item['date'] = found_on.isoformat()
+        else:
+            item = _new_item(rng, start, date_spread)
+        item['user'] = f"user{user_rng.randrange(max(count // 20, 1)) + 1}"
+        yield item
+
+
+def populate_database(connection, count, seed=7, batch_size=10000):
+    """Insert count generated items per side, and their reporters, into an app database
+
+    connection is a SQLAlchemy connection to a database with the app's tables. Item IDs
+    follow the app's L001/F001 scheme and created_at increases with the ID.
+    """
+    users = {}
+    start = datetime(2025, 1, 1)
+    for side, table, prefix in (('lost', 'lost_item', 'L'), ('found', 'found_item', 'F')):
+        insert = text(f"INSERT INTO {table} (item_id, name, \"desc\", category, location, date, created_at, "
+                      "user_id) VALUES (:item_id, :name, :desc, :category, :location, :date, :created_at, :user_id)")
+        batch = []
+        for number, item in enumerate(generate_items(count, seed, side), 1):
+            batch.append({
+                'item_id': f"{prefix}{number:03d}", 'name': item['name'], 'desc': item['desc'],
+                'category': item['category'], 'location': item['location'], 'date': item['date'],
+                'created_at': (start + timedelta(seconds=number)).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                'user_id': users.setdefault(item['user'], len(users) + 1),
+            })
+            if len(batch) >= batch_size:
+                connection.execute(insert, batch)
+                batch = []
+        if batch:
+            connection.execute(insert, batch)
+    connection.execute(text("INSERT INTO user (id, username, name, email, password_hash) "
+                            "VALUES (:id, :username, :username, :email, 'x')"),
+                       [{'id': user_id, 'username': username, 'email': f"{username}@campus.edu"}
+                        for username, user_id in users.items()])
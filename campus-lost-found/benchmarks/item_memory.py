@@ -0,0 +1,67 @@
+"""Bytes per in-memory catalog item, plain attribute-dict items vs the compact Item
+
+    python -m benchmarks.item_memory [--items 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.catalog import generate_items  # noqa: E402
+from data_structures import Item, LostAndFoundMatcher  # noqa: E402
+
+
+class PlainItem:
+    """The Item class as it was: an instance dict and the date kept as a string"""
+    def __init__(self, item_id, name, desc, category, location, date, user_name, photo=None):
+        self.id = item_id
+        self.name = name
+        self.desc = desc
+        self.category = category
+        self.location = location
+        self.date = date
+        self.user_name = user_name
+        self.photo = photo
+
+
+def rows(count):
+    """Item fields as they arrive from the database: every row has its own string objects"""
+    for i, item in enumerate(generate_items(count, 16), 1):
+        yield (f"L{i:06d}", item['name'], item['desc'], ''.join(item['category']), ''.join(item['location']),
+               item['date'], ''.join(item['user']))
+
+
+def measure(label, build, count):
+    gc.collect()
+    tracemalloc.start()
+    kept = build(list(rows(count)))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:36} {used / count:8.0f} bytes/item   {used / 2 ** 20:8.1f} MiB")
+    return kept
+
+
+def build_matcher(data):
+    matcher = LostAndFoundMatcher()
+    for item_id, name, desc, category, location, date, user_name in data:
+        matcher.add_lost_item(name, desc, category, location, date, user_name, item_id=item_id,
+                              index_name=False)
+    return matcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000, help='items to build')
+    args = parser.parse_args()
+
+    # Memory still held once the source rows are gone, names and descriptions included
+    measure("plain items", lambda data: [PlainItem(*row) for row in data], args.items)
+    measure("compact items", lambda data: [Item(*row) for row in data], args.items)
+    measure("matcher, one side, all indexes", build_matcher, args.items)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Sustained concurrent reads and writes from several app processes sharing one SQLite file
+
+    python -m benchmarks.load_test [--items 2000] [--readers 3] [--writers 2] [--seconds 20]
+                                   [--modes development,production]
+
+Each process imports the app the way a gunicorn worker does and drives it through the
+test client: readers page through lists, filters and match pages, writers report an item
+and delete it again. Every mode runs on a fresh copy of the same generated catalog, and
+the response cache is off so every read reaches the database.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.catalog import OBJECTS, generate_items, populate_database  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare(folder, items, seed, mode):
+    """Scratch instance with the catalog loaded and the app's startup work (migrations, matches) done"""
+    from sqlalchemy import create_engine
+    from models import db
+    instance = os.path.join(folder, 'instance')
+    os.makedirs(instance)
+    engine = create_engine(f"sqlite:///{os.path.join(instance, 'lost_and_found.db')}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        populate_database(connection, items, seed)
+    engine.dispose()
+    # One import first, so the worker processes do not race to migrate and fill the match table
+    subprocess.run([sys.executable, '-c', f"import sys; sys.path.insert(0, {APP_DIR!r}); import app"],
+                   cwd=folder, env=worker_env(folder, mode), check=True, capture_output=True)
+
+
+def worker_env(folder, mode):
+    return dict(os.environ, INSTANCE_PATH=os.path.join(folder, 'instance'), DATABASE_MODE=mode,
+                RESPONSE_CACHE_SIZE='0')
+
+
+def read_requests(rng, items):
+    words = [name.split()[0].lower() for names, _ in OBJECTS.values() for name in names]
+    while True:
+        kind = rng.choice(('list', 'filter', 'page', 'matches'))
+        side = rng.choice(('lost', 'found'))
+        if kind == 'list':
+            yield kind, f"/{side}"
+        elif kind == 'filter':
+            yield kind, f"/{side}?category={rng.choice(list(OBJECTS))}&q={rng.choice(words)}"
+        elif kind == 'page':
+            yield kind, f"/api/items/{side}?category={rng.choice(list(OBJECTS))}"
+        else:
+            prefix = 'L' if side == 'lost' else 'F'
+            yield kind, f"/matches/{prefix}{rng.randint(1, items):03d}/{side}"
+
+
+def run_worker(folder, mode, role, seconds, items, seed, results):
+    """One app process: returns {kind: [latencies]} and {kind: errors} through results"""
+    os.environ.update(worker_env(folder, mode))
+    os.chdir(folder)
+    sys.path.insert(0, APP_DIR)
+    import app as webapp
+    webapp.app.logger.disabled = True  # failed requests are counted below instead
+    client = webapp.app.test_client()
+    rng = random.Random(seed)
+    latencies = {}
+    errors = Counter()
+
+    def timed(kind, send):
+        started = time.perf_counter()
+        try:
+            status = send().status_code
+        except Exception:  # noqa: BLE001 - a crashed request is one more error to count
+            status = 500
+        latencies.setdefault(kind, []).append(time.perf_counter() - started)
+        if status >= 500:
+            errors[kind] += 1
+
+    deadline = time.perf_counter() + seconds
+    if role == 'reader':
+        for kind, url in read_requests(rng, items):
+            if time.perf_counter() >= deadline:
+                break
+            timed(kind, lambda: client.get(url))
+    else:
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        side = 'lost' if seed % 2 else 'found'
+        reports = generate_items(10 ** 6, seed, side)
+        while time.perf_counter() < deadline:
+            item = next(reports)
+            timed('report', lambda: client.post(f'/report-{side}', data={
+                key: item[key] for key in ('name', 'desc', 'category', 'location', 'date')}))
+            # The new ID is in the success message
+            with client.session_transaction() as flashes:
+                reported = re.findall(r'item ([LF]\d+) reported', str(flashes.pop('_flashes', '')))
+            if reported:
+                timed('delete', lambda: client.post(f'/delete-{side}/{reported[0]}'))
+                with client.session_transaction() as flashes:
+                    flashes.pop('_flashes', None)
+    webapp.match_jobs.jobs.join()
+    results.put((role, latencies, dict(errors)))
+
+
+def run_mode(mode, args):
+    folder = tempfile.mkdtemp(prefix='lost-found-load-')
+    try:
+        prepare(folder, args.items, args.seed, mode)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        roles = ['reader'] * args.readers + ['writer'] * args.writers
+        processes = [context.Process(target=run_worker, args=(folder, mode, role, args.seconds, args.items,
+                                                              args.seed + number, results))
+                     for number, role in enumerate(roles)]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    latencies = {}
+    errors = Counter()
+    for _, worker_latencies, worker_errors in collected:
+        for kind, samples in worker_latencies.items():
+            latencies.setdefault(kind, []).extend(samples)
+        errors.update(worker_errors)
+    print(f"\n== {mode} ({args.readers} readers, {args.writers} writers, {args.seconds}s) ==")
+    for kind, samples in sorted(latencies.items()):
+        samples.sort()
+        print(f"{kind:10} {len(samples) / args.seconds:8.1f} req/s   "
+              f"median {statistics.median(samples) * 1000:8.2f} ms   "
+              f"p95 {samples[int(len(samples) * 0.95)] * 1000:8.2f} ms   errors {errors[kind]}")
+    reads = sum(len(samples) for kind, samples in latencies.items() if kind not in ('report', 'delete'))
+    writes = sum(len(latencies.get(kind, [])) for kind in ('report', 'delete'))
+    print(f"total      {reads / args.seconds:8.1f} reads/s, {writes / args.seconds:.1f} writes/s, "
+          f"{sum(errors.values())} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=2000, help='catalog items per side')
+    parser.add_argument('--seed', type=int, default=7, help='catalog seed')
+    parser.add_argument('--readers', type=int, default=3, help='reader processes')
+    parser.add_argument('--writers', type=int, default=2, help='writer processes')
+    parser.add_argument('--seconds', type=float, default=20, help='duration of each run')
+    parser.add_argument('--modes', default='development,production', help='DATABASE_MODE values to compare')
+    args = parser.parse_args()
+    for mode in args.modes.split(','):
+        run_mode(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Query plans and timings of the hot queries before and after the index migration
+
+    python -m benchmarks.query_plans [--rows 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.catalog import populate_database  # noqa: E402
+from models import db  # noqa: E402
+from migrations import MIGRATIONS, upgrade  # noqa: E402
+
+QUERIES = [
+    ("list page", "SELECT * FROM lost_item ORDER BY created_at DESC, id DESC LIMIT 25", {}),
+    ("keyset page", "SELECT * FROM lost_item WHERE (created_at, id) < (:created_at, :id) "
+                    "ORDER BY created_at DESC, id DESC LIMIT 25",
+     {'created_at': '2025-06-01 00:00:00.000000', 'id': 50000}),
+    ("category filter", "SELECT * FROM lost_item WHERE category = :category "
+                        "ORDER BY created_at DESC, id DESC LIMIT 25", {'category': 'Books'}),
+    ("distinct categories", "SELECT DISTINCT category FROM lost_item", {}),
+    ("profile items", "SELECT * FROM lost_item WHERE user_id = :user_id", {'user_id': 42}),
+    ("category + date window", "SELECT id FROM found_item WHERE category = :category "
+                               "AND date BETWEEN :start AND :end", {'category': 'Keys', 'start': '2025-03-01',
+                                                                     'end': '2025-03-08'}),
+    ("match lookup", "SELECT * FROM item_match WHERE item_id = :item_id ORDER BY score DESC LIMIT 10",
+     {'item_id': 'L041'}),
+]
+
+
+def populate(connection, rows):
+    populate_database(connection, rows)
+    random.seed(7)
+    connection.execute(text("INSERT INTO item_match (item_id, match_item_id, score) "
+                            "VALUES (:item_id, :match_item_id, :score)"),
+                       [{'item_id': f"L{i:03d}", 'match_item_id': f"F{j:03d}", 'score': random.randint(30, 100)}
+                        for i in range(1, rows + 1, 10) for j in range(i, i + 10)])
+
+
+def measure(connection, label):
+    print(f"\n== {label} ==")
+    for name, sql, params in QUERIES:
+        plan = [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql), params)]
+        started = time.perf_counter()
+        for _ in range(20):
+            connection.execute(text(sql), params).fetchall()
+        elapsed = (time.perf_counter() - started) / 20 * 1000
+        print(f"{name:24} {elapsed:8.2f} ms   {' | '.join(plan)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='items per side')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_engine(f"sqlite:///{os.path.join(folder, 'bench.db')}")
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            # Start from the pre-migration schema
+            for _, _, statements in MIGRATIONS:
+                for statement in statements:
+                    if statement.startswith('CREATE INDEX IF NOT EXISTS'):
+                        connection.execute(text("DROP INDEX IF EXISTS " + statement.split()[5]))
+            populate(connection, args.rows)
+        with engine.begin() as connection:
+            measure(connection, f"before migration ({args.rows:,} items per side)")
+            upgrade(connection)
+            measure(connection, "after migration")
+
+
+if __name__ == '__main__':
+    main()
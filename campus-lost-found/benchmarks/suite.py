@@ -0,0 +1,249 @@
+"""Benchmark suite for the matcher, autocomplete and Flask routes on a generated catalog
+
+    python -m benchmarks.suite run [--items 1000] [--seed 7] [--suites insert,find_matches,...]
+                                   [--output results.json]
+    python -m benchmarks.suite compare base.json new.json [--threshold 0.10]
+
+Each benchmark reports the median, p95 and mean seconds per operation. compare flags any
+benchmark whose median got slower than the threshold and exits with status 1 if one did.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.catalog import generate_items, populate_database  # noqa: E402
+from data_structures import LostAndFoundMatcher  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUITES = {}
+
+
+def suite(func):
+    SUITES[func.__name__] = func
+    return func
+
+
+def summarize(samples, items=1):
+    """Seconds-per-operation statistics of timing samples (each covering items operations)"""
+    per_op = sorted(sample / items for sample in samples)
+    return {
+        'n': len(samples) * items,
+        'median': statistics.median(per_op),
+        'p95': per_op[min(len(per_op) - 1, int(len(per_op) * 0.95))],
+        'mean': statistics.fmean(per_op),
+        'ops_per_sec': 1 / statistics.fmean(per_op) if statistics.fmean(per_op) else None,
+    }
+
+
+def timed(func, inputs):
+    samples = []
+    for value in inputs:
+        started = time.perf_counter()
+        func(value)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+@suite
+def insert(context):
+    """Matcher insert throughput, which also builds the matcher the later suites use"""
+    matcher = LostAndFoundMatcher()
+    started = time.perf_counter()
+    for item in context['lost']:
+        matcher.add_lost_item(item['name'], item['desc'], item['category'], item['location'], item['date'],
+                              item['user'])
+    for item in context['found']:
+        matcher.add_found_item(item['name'], item['desc'], item['category'], item['location'], item['date'],
+                               item['user'])
+    elapsed = time.perf_counter() - started
+    context['matcher'] = matcher
+    return {'insert.matcher': summarize([elapsed], len(context['lost']) + len(context['found']))}
+
+
+@suite
+def find_matches(context):
+    matcher = context['matcher']
+    sample = context['rng'].sample(list(matcher.lost_items), min(200, len(matcher.lost_items)))
+    return {
+        'find_matches.top10': summarize(timed(lambda item_id: matcher.find_matches(item_id), sample)),
+        'find_matches.reverse': summarize(timed(lambda item_id: matcher.find_reverse_matches(item_id), sample)),
+    }
+
+
+@suite
+def autocomplete(context):
+    matcher = context['matcher']
+    rng = context['rng']
+    names = [item['name'].lower() for item in rng.sample(context['lost'], min(500, len(context['lost'])))]
+    prefixes = [name[:rng.randint(2, 6)] for name in names]
+    typos = [name[:2] + name[3:6] for name in names]  # third letter of a 6-letter prefix dropped
+    return {
+        'autocomplete.exact': summarize(timed(lambda prefix: matcher.get_autocomplete_suggestions(prefix),
+                                              prefixes)),
+        'autocomplete.fuzzy': summarize(timed(lambda prefix: matcher.get_autocomplete_suggestions(
+            prefix, fuzzy=True), typos)),
+    }
+
+
+@suite
+def routes(context):
+    """Flask routes through the test client, against a scratch database of the same catalog"""
+    folder = tempfile.mkdtemp(prefix='lost-found-bench-')
+    atexit.register(shutil.rmtree, folder, ignore_errors=True)
+    instance = os.path.join(folder, 'instance')
+    os.makedirs(instance)
+    from sqlalchemy import create_engine
+    from models import db
+    engine = create_engine(f"sqlite:///{os.path.join(instance, 'lost_and_found.db')}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        populate_database(connection, context['items'], context['seed'])
+    engine.dispose()
+
+    # The app sets itself up on import; point it at the scratch instance and upload folder
+    os.environ['INSTANCE_PATH'] = instance
+    os.chdir(folder)
+    import app as webapp
+    from match_store import record_matches
+    client = webapp.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    rng = context['rng']
+    lost_ids = rng.sample(sorted(webapp.matcher.lost_items), min(50, len(webapp.matcher.lost_items)))
+    with webapp.app.app_context():
+        for item_id in lost_ids:
+            record_matches(webapp.matcher, item_id, True)
+    words = [item['name'].split()[0] for item in rng.sample(context['lost'], min(50, len(context['lost'])))]
+
+    first_page = client.get('/api/items/lost').get_json()
+    cursor = first_page['next_cursor'] or ''
+    results = {
+        'routes.lost_list': summarize(timed(lambda _: client.get('/lost'), range(50))),
+        'routes.lost_search': summarize(timed(lambda word: client.get('/lost', query_string={'q': word}), words)),
+        'routes.api_items_page2': summarize(timed(lambda _: client.get('/api/items/lost',
+                                                                       query_string={'cursor': cursor}), range(50))),
+        'routes.api_search': summarize(timed(lambda word: client.get('/api/search', query_string={'q': word}),
+                                             words)),
+        'routes.view_matches': summarize(timed(lambda item_id: client.get(f'/matches/{item_id}/lost'), lost_ids)),
+        'routes.autocomplete': summarize(timed(lambda word: client.get('/api/autocomplete', query_string={
+            'prefix': word[:3], 'type': 'lost'}), words)),
+    }
+
+    # Report throughput includes the background scoring of each new item
+    reports = list(generate_items(50, context['seed'] + 1))
+    started = time.perf_counter()
+    for item in reports:
+        client.post('/report-lost', data={key: item[key] for key in ('name', 'desc', 'category', 'location',
+                                                                      'date')})
+    webapp.match_jobs.jobs.join()
+    results['routes.report_lost'] = summarize([time.perf_counter() - started], len(reports))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    output = os.path.abspath(args.output) if args.output else None
+    names = args.suites.split(',') if args.suites else list(SUITES)
+    unknown = [name for name in names if name not in SUITES]
+    if unknown:
+        sys.exit(f"Unknown suites: {', '.join(unknown)} (available: {', '.join(SUITES)})")
+    if 'insert' not in names and set(names) & {'find_matches', 'autocomplete'}:
+        names.insert(0, 'insert')
+
+    context = {
+        'items': args.items,
+        'seed': args.seed,
+        'rng': random.Random(args.seed),
+        'lost': list(generate_items(args.items, args.seed, 'lost')),
+        'found': list(generate_items(args.items, args.seed, 'found')),
+    }
+    report = {
+        'meta': {
+            'items': args.items, 'seed': args.seed, 'commit': git_commit(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'started': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': {},
+    }
+    # Routes import the app, which changes the working directory, so they always run last
+    for name in sorted(names, key=lambda name: name == 'routes'):
+        for key, result in SUITES[name](context).items():
+            report['results'][key] = result
+            print(f"{key:28} median {result['median'] * 1000:9.3f} ms   p95 {result['p95'] * 1000:9.3f} ms   "
+                  f"n={result['n']}", flush=True)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {output}")
+
+
+def compare(args):
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    if base['meta']['items'] != new['meta']['items'] or base['meta']['seed'] != new['meta']['seed']:
+        print("Warning: the runs used different catalogs (items/seed), so timings are not comparable")
+
+    regressions = []
+    for key in sorted(set(base['results']) & set(new['results'])):
+        before = base['results'][key]['median']
+        after = new['results'][key]['median']
+        change = after / before - 1 if before else 0.0
+        if change > args.threshold:
+            verdict = 'REGRESSION'
+            regressions.append(key)
+        elif change < -args.threshold:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        print(f"{key:28} {before * 1000:9.3f} ms -> {after * 1000:9.3f} ms  {change:+7.1%}  {verdict}")
+    for key in sorted(set(base['results']) ^ set(new['results'])):
+        print(f"{key:28} only in {'base' if key in base['results'] else 'new'}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--items', type=int, default=1000, help='items per side (1k to 1M)')
+    run_parser.add_argument('--seed', type=int, default=7, help='catalog seed')
+    run_parser.add_argument('--suites', help=f"comma-separated subset of: {', '.join(SUITES)}")
+    run_parser.add_argument('--output', help='write results as JSON to this file')
+    compare_parser = commands.add_parser('compare', help='compare two JSON results')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='slowdown of the median that counts as a regression')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
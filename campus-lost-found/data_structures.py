@@ -1,243 +1,790 @@
-from datetime import datetime
+import bisect
+import heapq
+import sys
+import threading
+from collections import Counter, OrderedDict
+from datetime import date as Date, datetime
 from difflib import SequenceMatcher
+from metrics import FIND_MATCHES_SECONDS, RATIO_CALLS, SIMILARITY_PAIRS, TRIE_LOOKUP_SECONDS
+from vector_scoring import VectorIndex
+
+_PAIRS_SCORED = SIMILARITY_PAIRS.labels('scored')
+_PAIRS_PRUNED = SIMILARITY_PAIRS.labels('pruned')
+_RATIO_CALLS = RATIO_CALLS.labels()
+
+
+def _common_prefix_length(a, b):
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+def _id_number(item_id):
+    """Numeric part of an item ID like 'L042' (0 if it has none)"""
+    digits = item_id[1:]
+    return int(digits) if digits.isdigit() else 0
+
+
+def _day_ordinal(date):
+    """Day number of a '%Y-%m-%d' date string (None if it is missing or malformed)"""
+    try:
+        return datetime.strptime(date, '%Y-%m-%d').toordinal()
+    except (TypeError, ValueError):
+        return None
 
 
 class Item:
-    """Item class to store lost/found items"""
+    """Item class to store lost/found items
+    
+    Slots instead of a per-instance dict, category and location interned (there are only
+    a handful of distinct values) and the date kept as a day ordinal, parsed once.
+    """
+    __slots__ = ('id', 'name', 'desc', 'category', 'location', 'day', 'user_name', 'photo')
+    
     def __init__(self, item_id, name, desc, category, location, date, user_name, photo=None):
         self.id = item_id
         self.name = name
         self.desc = desc
-        self.category = category
-        self.location = location
-        self.date = date
+        self.category = sys.intern(category)
+        self.location = sys.intern(location)
+        self.day = _day_ordinal(date)
         self.user_name = user_name
         self.photo = photo
+    
+    @property
+    def date(self):
+        return Date.fromordinal(self.day).isoformat() if self.day is not None else None
 
 
 class TrieNode:
-    """Trie node for autocomplete"""
-    def __init__(self):
+    """Radix trie node: the edge into it is labelled with a whole substring"""
+    __slots__ = ('label', 'children', 'word', 'count', 'top')
+    
+    def __init__(self, label=''):
+        self.label = label
         self.children = {}
-        self.is_end = False
-        self.words = []
+        self.word = None
+        self.count = 0
+        self.top = []  # Best (-count, word) pairs in this subtree, at most top_k
 
 
 class Trie:
-    """Trie data structure for autocomplete"""
-    def __init__(self):
+    """Compressed trie for autocomplete, ranking words by how often they were inserted"""
+    def __init__(self, top_k=10):
         self.root = TrieNode()
+        self.top_k = top_k
+        self.size = 0
     
-    def insert(self, word):
+    def insert(self, word, count=1):
+        word = word.lower()
         node = self.root
-        for char in word.lower():
-            if char not in node.children:
-                node.children[char] = TrieNode()
-            node = node.children[char]
-            if word.lower() not in node.words:
-                node.words.append(word.lower())
-        node.is_end = True
+        path = [node]
+        rest = word
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                child = TrieNode(rest)
+                node.children[rest[0]] = child
+                common = len(rest)
+            else:
+                common = _common_prefix_length(child.label, rest)
+                if common < len(child.label):
+                    # Split the edge where the word leaves it
+                    middle = TrieNode(child.label[:common])
+                    middle.top = list(child.top)
+                    child.label = child.label[common:]
+                    middle.children[child.label[0]] = child
+                    node.children[rest[0]] = middle
+                    child = middle
+            node = child
+            path.append(node)
+            rest = rest[common:]
+        
+        if node.word is None:
+            node.word = word
+            self.size += 1
+        node.count += count
+        for path_node in path:
+            self._offer(path_node, word, node.count)
+    
+    def delete(self, word, count=None):
+        """Remove count occurrences of a word (all when None); returns False if it was not present"""
+        path = self._path(word.lower())
+        if path is None:
+            return False
+        node = path[-1]
+        node.count = 0 if count is None else node.count - count
+        if node.count <= 0:
+            node.count = 0
+            node.word = None
+            self.size -= 1
+        
+        # Drop nodes that no longer lead to a word and merge single-child chains back together
+        for i in range(len(path) - 1, 0, -1):
+            node, parent = path[i], path[i - 1]
+            if node.word is not None:
+                continue
+            if not node.children:
+                del parent.children[node.label[0]]
+            elif len(node.children) == 1:
+                (child,) = node.children.values()
+                node.label += child.label
+                node.children = child.children
+                node.word, node.count, node.top = child.word, child.count, child.top
+        
+        for path_node in reversed(path):
+            self._refresh(path_node)
+        return True
     
     def search_prefix(self, prefix):
         node = self.root
-        for char in prefix.lower():
-            if char not in node.children:
+        rest = prefix.lower()
+        if not rest:
+            return []
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            if rest.startswith(child.label):
+                rest = rest[len(child.label):]
+            elif not child.label.startswith(rest):
                 return []
-            node = node.children[char]
-        return sorted(set(node.words))[:10]
+            else:
+                rest = ''
+            node = child
+        return [word for _, word in node.top]
+    
+    def search_fuzzy(self, prefix, max_distance=None):
+        """Suggestions for a prefix that may contain typos, closest first, then most popular
+        
+        Walks the trie with a bounded edit-distance (Levenshtein plus adjacent transpositions)
+        table, pruning every branch whose best cell is already over max_distance. By default
+        short prefixes must match exactly, 3-5 characters allow 1 edit and longer ones 2.
+        """
+        query = prefix.lower()
+        if not query:
+            return []
+        if max_distance is None:
+            max_distance = 0 if len(query) < 3 else 1 if len(query) < 6 else 2
+        
+        best = {}
+        first_row = list(range(len(query) + 1))
+        stack = [(self.root, first_row, None, '')]
+        while stack:
+            node, row, previous_row, previous_char = stack.pop()
+            for child in node.children.values():
+                child_row, child_previous, child_char = row, previous_row, previous_char
+                for char in child.label:
+                    new_row = [child_row[0] + 1]
+                    for i in range(1, len(query) + 1):
+                        cost = query[i - 1] != char
+                        value = min(new_row[i - 1] + 1, child_row[i] + 1, child_row[i - 1] + cost)
+                        if (child_previous is not None and i > 1 and query[i - 1] == child_char
+                                and query[i - 2] == char):
+                            value = min(value, child_previous[i - 2] + 1)
+                        new_row.append(value)
+                    child_previous, child_row, child_char = child_row, new_row, char
+                    if new_row[-1] <= max_distance:
+                        # The whole prefix matches here: every word below is a suggestion
+                        for negative_count, word in child.top:
+                            if new_row[-1] < best.get(word, (max_distance + 1,))[0]:
+                                best[word] = (new_row[-1], negative_count)
+                    if min(new_row) > max_distance:
+                        break
+                else:
+                    stack.append((child, child_row, child_previous, child_char))
+        
+        ranked = sorted(best.items(), key=lambda entry: (entry[1], entry[0]))
+        return [word for word, _ in ranked[:self.top_k]]
+    
+    def _path(self, word):
+        """Nodes from the root to the node holding word, or None"""
+        node = self.root
+        path = [node]
+        rest = word
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None or not rest.startswith(child.label):
+                return None
+            rest = rest[len(child.label):]
+            node = child
+            path.append(node)
+        return path if node.word is not None else None
+    
+    def _offer(self, node, word, count):
+        """Put word with its new (higher) count into node's top list"""
+        top = [entry for entry in node.top if entry[1] != word]
+        bisect.insort(top, (-count, word))
+        node.top = top[:self.top_k]
+    
+    def _refresh(self, node):
+        """Rebuild node's top list from its own word and its children's lists"""
+        entries = [(-node.count, node.word)] if node.word is not None else []
+        for child in node.children.values():
+            entries.extend(child.top)
+        node.top = heapq.nsmallest(self.top_k, entries)
+    
+    def items(self):
+        """Yield (word, count) pairs in alphabetical order"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.word is not None:
+                yield node.word, node.count
+            stack.extend(node.children[key] for key in sorted(node.children, reverse=True))
+    
+    @classmethod
+    def from_counts(cls, counts, top_k=10):
+        """Build a trie from (word, count) pairs in one pass, much faster than repeated insert()"""
+        merged = Counter()
+        for word, count in counts:
+            merged[word.lower()] += count
+        trie = cls(top_k)
+        
+        # Sorted words only ever extend the rightmost path; stack holds it with each node's depth
+        stack = [(trie.root, 0)]
+        previous = ''
+        for word, count in sorted(merged.items()):
+            common = _common_prefix_length(previous, word)
+            while stack[-1][1] > common:
+                node, _ = stack.pop()
+                parent, parent_depth = stack[-1]
+                if parent_depth < common:
+                    # The new word leaves this edge part-way: split it
+                    middle = TrieNode(node.label[:common - parent_depth])
+                    node.label = node.label[common - parent_depth:]
+                    middle.children[node.label[0]] = node
+                    parent.children[middle.label[0]] = middle
+                    stack.append((middle, common))
+            if len(word) > common:
+                leaf = TrieNode(word[common:])
+                stack[-1][0].children[leaf.label[0]] = leaf
+                stack.append((leaf, len(word)))
+            node = stack[-1][0]
+            node.word = word
+            node.count = count
+            trie.size += 1
+            previous = word
+        
+        # Fill the top-k lists bottom-up
+        order = []
+        pending = [trie.root]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            pending.extend(node.children.values())
+        for node in reversed(order):
+            trie._refresh(node)
+        return trie
+    
+    def __len__(self):
+        return self.size
 
 
-class BSTNode:
-    """Binary Search Tree Node"""
-    def __init__(self, key, value):
-        self.key = key
-        self.value = value
-        self.left = None
-        self.right = None
+class CategoryIndex:
+    """Items grouped by category, each group kept sorted by date (replaces the old BST)
+    
+    A category is a dict lookup and each group is a sorted list, so inserting or removing
+    an item is a binary search and nothing recurses however many items share a category.
+    """
+    def __init__(self):
+        self.groups = {}
+        self.keys = {}
+        self.items = {}
+        self.sequence = 0
+    
+    def insert(self, item):
+        if item.id in self.keys:
+            self.remove(item.id)
+        # Items with the same date stay in insertion order; missing dates sort first
+        self.sequence += 1
+        key = (item.day or 0, self.sequence, item.id)
+        bisect.insort(self.groups.setdefault(item.category, []), key)
+        self.keys[item.id] = (item.category, key)
+        self.items[item.id] = item
+    
+    def remove(self, item_id):
+        entry = self.keys.pop(item_id, None)
+        if entry is None:
+            return None
+        category, key = entry
+        group = self.groups[category]
+        del group[bisect.bisect_left(group, key)]
+        if not group:
+            del self.groups[category]
+        return self.items.pop(item_id)
+    
+    def items_in(self, category, reverse=False):
+        """Yield every item in a category, oldest first (newest first with reverse=True)"""
+        group = self.groups.get(category, [])
+        for _, _, item_id in (reversed(group) if reverse else group):
+            yield self.items[item_id]
+    
+    def categories(self):
+        return sorted(self.groups)
+    
+    def __len__(self):
+        return len(self.keys)
 
 
-class BST:
-    """Binary Search Tree for organizing items by category"""
-    def __init__(self):
-        self.root = None
+class CandidateIndex:
+    """Inverted index for picking likely matches before full scoring"""
+    def __init__(self, gram_size=3):
+        self.gram_size = gram_size
+        self.postings = {}
+        self.key_objects = {}
+        self.keys = {}
+        self.order = {}
+        self.sequence = 0
     
-    def insert(self, key, value):
-        if self.root is None:
-            self.root = BSTNode(key, value)
-        else:
-            self._insert_recursive(self.root, key, value)
+    def _grams(self, text):
+        grams = set()
+        for token in text.lower().split():
+            grams.add(token)
+            padded = f" {token} "
+            for i in range(len(padded) - self.gram_size + 1):
+                grams.add(padded[i:i + self.gram_size])
+        return grams
     
-    def _insert_recursive(self, node, key, value):
-        if key < node.key:
-            if node.left is None:
-                node.left = BSTNode(key, value)
-            else:
-                self._insert_recursive(node.left, key, value)
-        else:
-            if node.right is None:
-                node.right = BSTNode(key, value)
-            else:
-                self._insert_recursive(node.right, key, value)
+    def _keys(self, name, desc, category, location, date):
+        name_keys = {('n', gram) for gram in self._grams(name)}
+        desc_keys = {('d', gram) for gram in self._grams(desc)}
+        return name_keys, desc_keys, category.lower(), location.lower(), _day_ordinal(date)
+    
+    def add(self, item_id, name, desc, category, location, date):
+        if item_id in self.keys:
+            self.remove(item_id)
+        name_keys, desc_keys, category, location, day = self._keys(name, desc, category, location, date)
+        keys = name_keys | desc_keys | {('c', category), ('l', location), ('t', day)}
+        # Every item holding a key shares one key object, the one the postings were first filed under
+        shared = []
+        for key in keys:
+            bucket = self.postings.get(key)
+            if bucket is None:
+                bucket = self.postings[key] = set()
+                self.key_objects[key] = key
+            bucket.add(item_id)
+            shared.append(self.key_objects[key])
+        self.keys[item_id] = tuple(shared)
+        self.sequence += 1
+        self.order[item_id] = self.sequence
     
-    def get_all(self):
-        result = []
-        self._inorder_traversal(self.root, result)
-        return result
+    def remove(self, item_id):
+        keys = self.keys.pop(item_id, None)
+        if keys is None:
+            return
+        for key in keys:
+            bucket = self.postings.get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self.postings[key]
+                    del self.key_objects[key]
+        del self.order[item_id]
     
-    def _inorder_traversal(self, node, result):
-        if node:
-            self._inorder_traversal(node.left, result)
-            result.append(node.value)
-            self._inorder_traversal(node.right, result)
+    def candidates(self, name, desc, category, location, date):
+        """Yield (score bound, item ID) for every item, highest bound first
+        
+        The bound is the score with perfect name and description similarity, so it is
+        exact for the category, location and date and never below the real score; a caller
+        can stop as soon as it drops below the score it needs. Within one bound, items
+        sharing more name and description n-grams come first, to raise that score early.
+        """
+        name_keys, desc_keys, category, location, day = self._keys(name, desc, category, location, date)
+        
+        # Exact buckets: category (20%), location (15%), dates within a week (5%)
+        exact = {}
+        buckets = [(('c', category), 20), (('l', location), 15)]
+        if day is not None:
+            buckets += [(('t', day + offset), 5 * (1 - abs(offset) / 7)) for offset in range(-7, 8)]
+        for key, weight in buckets:
+            for item_id in self.postings.get(key, ()):
+                exact[item_id] = exact.get(item_id, 0) + weight
+        
+        # Text overlap, weighted like the name (40%) and description (20%) scores
+        overlap = {}
+        for keys, weight in ((name_keys, 40), (desc_keys, 20)):
+            if not keys:
+                continue
+            share = weight / len(keys)
+            for key in keys:
+                for item_id in self.postings.get(key, ()):
+                    overlap[item_id] = overlap.get(item_id, 0) + share
+        
+        touched = exact.keys() | overlap.keys()
+        bounds = {item_id: int(60 + exact.get(item_id, 0)) for item_id in touched}
+        for item_id in sorted(touched, key=lambda item_id: (-bounds[item_id], -overlap.get(item_id, 0),
+                                                             self.order[item_id])):
+            yield bounds[item_id], item_id
+        # The rest share no key at all, which leaves only the text similarity (60%)
+        for item_id in self.order:
+            if item_id not in touched:
+                yield 60, item_id
+    
+    def __len__(self):
+        return len(self.keys)
+
+
+class ItemFeatures:
+    """An item's fields as calculate_similarity compares them, worked out once"""
+    __slots__ = ('name', 'desc', 'category', 'location', 'day', 'name_matcher', 'desc_matcher')
+    
+    def __init__(self, item):
+        self.name = item.name.lower()
+        self.desc = item.desc.lower()
+        self.category = item.category.lower()
+        self.location = item.location.lower()
+        self.day = item.day
+        # SequenceMatcher indexes its second sequence up front; keeping one per item with that
+        # item as the second sequence means only set_seq1() is needed when it is scored against
+        self.name_matcher = SequenceMatcher(None, '', self.name)
+        self.desc_matcher = SequenceMatcher(None, '', self.desc)
+
+
+class FeatureCache:
+    """LRU cache of ItemFeatures keyed by item ID
+    
+    Entries must be invalidated when an item changes or goes away. Not thread-safe
+    (the matchers kept in it are reused), like the rest of the matcher.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, item):
+        features = self.entries.get(item.id)
+        if features is not None:
+            self.hits += 1
+            self.entries.move_to_end(item.id)
+            return features
+        self.misses += 1
+        features = self.entries[item.id] = ItemFeatures(item)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return features
+    
+    def invalidate(self, item_id):
+        self.entries.pop(item_id, None)
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def __len__(self):
+        return len(self.entries)
 
 
 class LostAndFoundMatcher:
     """Main system for managing lost and found items"""
-    def __init__(self):
+    BACKENDS = ('exact', 'vector')
+    
+    def __init__(self, backend='exact', feature_cache_size=4096):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown match backend {backend!r}, expected one of {self.BACKENDS}")
+        self.backend = backend
         self.lost_items = {}
         self.found_items = {}
         self.lost_trie = Trie()
         self.found_trie = Trie()
-        self.lost_bst = BST()
-        self.found_bst = BST()
+        self.lost_categories = CategoryIndex()
+        self.found_categories = CategoryIndex()
+        self.lost_index = CandidateIndex()
+        self.found_index = CandidateIndex()
+        self.lost_vectors = VectorIndex() if backend == 'vector' else None
+        self.found_vectors = VectorIndex() if backend == 'vector' else None
+        self.features = FeatureCache(feature_cache_size)
         self.lost_counter = 0
         self.found_counter = 0
+        self.trie_version = 0  # Bumped on every trie change, so cached suggestions can tell they are stale
+        # Autocomplete reads the tries without waiting for whoever holds the matcher (e.g. a long
+        # scoring run), so trie updates and lookups take this lock of their own
+        self.trie_lock = threading.Lock()
     
-    def add_lost_item(self, name, desc, category, location, date, user_name, photo=None):
-        self.lost_counter += 1
-        item_id = f"L{self.lost_counter:03d}"
+    def add_lost_item(self, name, desc, category, location, date, user_name, photo=None, item_id=None,
+                      index_name=True):
+        if item_id is None:
+            self.lost_counter += 1
+            item_id = f"L{self.lost_counter:03d}"
+        else:
+            # Like the database sequence: continue after the highest ID seen, never reuse one
+            self.lost_counter = max(self.lost_counter, _id_number(item_id))
         
         item = Item(item_id, name, desc, category, location, date, user_name, photo)
         self.lost_items[item_id] = item
+        self.features.invalidate(item_id)
+        
+        # Add to Trie (bulk loads skip this and call rebuild_tries() once at the end)
+        if index_name:
+            with self.trie_lock:
+                self.lost_trie.insert(name)
+                self.trie_version += 1
         
-        # Add to Trie
-        self.lost_trie.insert(name)
+        # Add to category index
+        self.lost_categories.insert(item)
         
-        # Add to BST
-        self.lost_bst.insert(category, item)
+        # Add to candidate index (and vector index when that backend is in use)
+        self.lost_index.add(item_id, name, desc, category, location, date)
+        if self.lost_vectors is not None:
+            self.lost_vectors.add(item_id, name, desc, category, location, date)
         
         return item_id
     
-    def add_found_item(self, name, desc, category, location, date, user_name, photo=None):
-        self.found_counter += 1
-        item_id = f"F{self.found_counter:03d}"
+    def add_found_item(self, name, desc, category, location, date, user_name, photo=None, item_id=None,
+                      index_name=True):
+        if item_id is None:
+            self.found_counter += 1
+            item_id = f"F{self.found_counter:03d}"
+        else:
+            # Like the database sequence: continue after the highest ID seen, never reuse one
+            self.found_counter = max(self.found_counter, _id_number(item_id))
         
         item = Item(item_id, name, desc, category, location, date, user_name, photo)
         self.found_items[item_id] = item
+        self.features.invalidate(item_id)
+        
+        # Add to Trie (bulk loads skip this and call rebuild_tries() once at the end)
+        if index_name:
+            with self.trie_lock:
+                self.found_trie.insert(name)
+                self.trie_version += 1
         
-        # Add to Trie
-        self.found_trie.insert(name)
+        # Add to category index
+        self.found_categories.insert(item)
         
-        # Add to BST
-        self.found_bst.insert(category, item)
+        # Add to candidate index (and vector index when that backend is in use)
+        self.found_index.add(item_id, name, desc, category, location, date)
+        if self.found_vectors is not None:
+            self.found_vectors.add(item_id, name, desc, category, location, date)
         
         return item_id
     
-    def get_autocomplete_suggestions(self, prefix, item_type='lost'):
-        if item_type == 'lost':
-            return self.lost_trie.search_prefix(prefix)
-        else:
-            return self.found_trie.search_prefix(prefix)
+    def remove_lost_item(self, item_id):
+        item = self.lost_items.pop(item_id, None)
+        if item is not None:
+            with self.trie_lock:
+                self.lost_trie.delete(item.name, count=1)
+                self.trie_version += 1
+            self.lost_categories.remove(item_id)
+            self.features.invalidate(item_id)
+            self.lost_index.remove(item_id)
+            if self.lost_vectors is not None:
+                self.lost_vectors.remove(item_id)
+        return item
     
-    def calculate_similarity(self, item1, item2):
-        """Calculate similarity score between two items"""
+    def remove_found_item(self, item_id):
+        item = self.found_items.pop(item_id, None)
+        if item is not None:
+            with self.trie_lock:
+                self.found_trie.delete(item.name, count=1)
+                self.trie_version += 1
+            self.found_categories.remove(item_id)
+            self.features.invalidate(item_id)
+            self.found_index.remove(item_id)
+            if self.found_vectors is not None:
+                self.found_vectors.remove(item_id)
+        return item
+    
+    def rebuild_tries(self):
+        """Rebuild both autocomplete tries from the current items"""
+        lost_trie = Trie.from_counts((item.name, 1) for item in self.lost_items.values())
+        found_trie = Trie.from_counts((item.name, 1) for item in self.found_items.values())
+        with self.trie_lock:
+            self.lost_trie, self.found_trie = lost_trie, found_trie
+            self.trie_version += 1
+    
+    def get_autocomplete_suggestions(self, prefix, item_type='lost', fuzzy=False):
+        """Suggested names for a prefix; safe to call while another thread updates the matcher"""
+        with self.trie_lock, TRIE_LOOKUP_SECONDS.labels('fuzzy' if fuzzy else 'exact').time():
+            trie = self.lost_trie if item_type == 'lost' else self.found_trie
+            if fuzzy:
+                return trie.search_fuzzy(prefix)
+            return trie.search_prefix(prefix)
+    
+    def _combine(self, name_sim, desc_sim, features1, features2):
+        """Weighted score from the two text similarities plus the exact fields"""
         score = 0
         
         # Name similarity (40%)
-        name_sim = SequenceMatcher(None, item1.name.lower(), item2.name.lower()).ratio()
         score += name_sim * 40
         
         # Description similarity (20%)
-        desc_sim = SequenceMatcher(None, item1.desc.lower(), item2.desc.lower()).ratio()
         score += desc_sim * 20
         
         # Category match (20%)
-        if item1.category.lower() == item2.category.lower():
+        if features1.category == features2.category:
             score += 20
         
         # Location match (15%)
-        if item1.location.lower() == item2.location.lower():
+        if features1.location == features2.location:
             score += 15
         
         # Date proximity (5%)
-        try:
-            date1 = datetime.strptime(item1.date, '%Y-%m-%d')
-            date2 = datetime.strptime(item2.date, '%Y-%m-%d')
-            days_diff = abs((date1 - date2).days)
+        if features1.day is not None and features2.day is not None:
+            days_diff = abs(features1.day - features2.day)
             if days_diff <= 7:
                 score += 5 * (1 - days_diff / 7)
-        except:
-            pass
         
         return int(score)
     
-    def find_matches(self, item_id, is_lost=True):
-        """Find potential matches for an item"""
+    def calculate_similarity(self, item1, item2):
+        """Calculate similarity score between two items"""
+        features1 = self.features.get(item1)
+        features2 = self.features.get(item2)
+        features2.name_matcher.set_seq1(features1.name)
+        features2.desc_matcher.set_seq1(features1.desc)
+        _PAIRS_SCORED.inc()
+        _RATIO_CALLS.inc(2)
+        return self._combine(features2.name_matcher.ratio(), features2.desc_matcher.ratio(),
+                             features1, features2)
+    
+    def similarity_at_least(self, item1, item2, floor):
+        """calculate_similarity(item1, item2), or None as soon as it is certain to be below floor
+        
+        Upper bounds on the text similarities are tightened step by step (perfect,
+        real_quick_ratio, quick_ratio, then the name's real ratio) and the full ratio()
+        calls are only made while the bound still reaches floor. _combine only adds,
+        so a bound on each similarity is a bound on the score.
+        """
+        features1 = self.features.get(item1)
+        features2 = self.features.get(item2)
+        if self._combine(1.0, 1.0, features1, features2) < floor:
+            _PAIRS_PRUNED.inc()
+            return None
+        
+        name_matcher = features2.name_matcher
+        desc_matcher = features2.desc_matcher
+        name_matcher.set_seq1(features1.name)
+        desc_matcher.set_seq1(features1.desc)
+        name_bound = name_matcher.real_quick_ratio()
+        desc_bound = desc_matcher.real_quick_ratio()
+        if self._combine(name_bound, desc_bound, features1, features2) < floor:
+            _PAIRS_PRUNED.inc()
+            return None
+        name_bound = name_matcher.quick_ratio()
+        desc_bound = desc_matcher.quick_ratio()
+        if self._combine(name_bound, desc_bound, features1, features2) < floor:
+            _PAIRS_PRUNED.inc()
+            return None
+        
+        name_sim = name_matcher.ratio()
+        if self._combine(name_sim, desc_bound, features1, features2) < floor:
+            _RATIO_CALLS.inc()
+            _PAIRS_PRUNED.inc()
+            return None
+        score = self._combine(name_sim, desc_matcher.ratio(), features1, features2)
+        _RATIO_CALLS.inc(2)
+        _PAIRS_SCORED.inc()
+        return score if score >= floor else None
+    
+    def find_matches(self, item_id, is_lost=True, limit=10, backend=None):
+        """Find potential matches for an item (all of them when limit is None)
+        
+        backend overrides the matcher's scoring backend for this call, e.g. to
+        A/B the 'vector' scores against the 'exact' SequenceMatcher ones.
+        """
+        with FIND_MATCHES_SECONDS.labels(backend or self.backend).time():
+            return self._find_matches(item_id, is_lost, limit, backend)
+    
+    def _find_matches(self, item_id, is_lost, limit, backend):
         if is_lost:
             source_items = self.lost_items
             target_items = self.found_items
+            target_index = self.found_index
+            target_vectors = self.found_vectors
         else:
             source_items = self.found_items
             target_items = self.lost_items
+            target_index = self.lost_index
+            target_vectors = self.lost_vectors
         
         if item_id not in source_items:
             return []
         
         source_item = source_items[item_id]
-        matches = []
         
-        for target_id, target_item in target_items.items():
-            score = self.calculate_similarity(source_item, target_item)
-            if score >= 30:  # Minimum threshold
+        if (backend or self.backend) == 'vector':
+            if target_vectors is None:
+                raise ValueError("The vector backend was not enabled for this matcher")
+            results = target_vectors.top_matches(source_item.name, source_item.desc, source_item.category,
+                                                 source_item.location, source_item.date, limit=limit)
+            return [{'item': target_items[target_id], 'score': score} for target_id, score in results]
+        
+        candidates = target_index.candidates(source_item.name, source_item.desc, source_item.category,
+                                             source_item.location, source_item.date)
+        
+        # Min-heap of the best (score, -insertion order) so far; once it holds limit entries a
+        # candidate must beat the k-th best to get in (an equal score loses to the older item).
+        # Candidates come highest bound first, so the scan ends once no bound reaches the floor.
+        heap = []
+        floor = 30  # Minimum threshold
+        for bound, target_id in candidates:
+            if bound < floor:
+                break
+            target_item = target_items[target_id]
+            score = self.similarity_at_least(source_item, target_item, floor)
+            if score is None:
+                continue
+            entry = (score, -target_index.order[target_id], target_item)
+            if not limit:
+                heap.append(entry)
+            elif len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+            if limit and len(heap) == limit:
+                floor = max(floor, heap[0][0])
+        
+        # Best score first, ties oldest first
+        heap.sort(key=lambda entry: (-entry[0], -entry[1]))
+        return [{'item': target_item, 'score': score} for score, _, target_item in heap]
+    
+    def find_reverse_matches(self, item_id, is_lost=True, floors=None):
+        """Score an item from the side of each of its candidates (the score is not symmetric)
+        
+        floors maps candidate IDs to the lowest score worth returning for them (30 by
+        default), e.g. what it takes to enter their top-k lists; candidates whose bound
+        is below their floor are skipped before any ratio() call.
+        """
+        floors = floors or {}
+        if self.backend == 'vector':
+            # Dice similarity is symmetric, so the forward scores already are the reverse ones
+            return [match for match in self.find_matches(item_id, is_lost, limit=None)
+                    if match['score'] >= floors.get(match['item'].id, 30)]
+        
+        if is_lost:
+            source_items, target_items, target_index = self.lost_items, self.found_items, self.found_index
+        else:
+            source_items, target_items, target_index = self.found_items, self.lost_items, self.lost_index
+        
+        if item_id not in source_items:
+            return []
+        
+        source_item = source_items[item_id]
+        matches = []
+        for bound, target_id in target_index.candidates(source_item.name, source_item.desc, source_item.category,
+                                                        source_item.location, source_item.date):
+            floor = floors.get(target_id, 30)  # Minimum threshold
+            if bound < floor:
+                continue
+            target_item = target_items[target_id]
+            score = self.similarity_at_least(target_item, source_item, floor)
+            if score is not None:
                 matches.append({
                     'item': target_item,
                     'score': score
                 })
-        
-        # Sort by score descending
-        matches.sort(key=lambda x: x['score'], reverse=True)
-        return matches[:10]  # Return top 10 matches
+        return matches
     
     def get_all_categories(self, item_type='lost'):
         """Get all unique categories"""
         if item_type == 'lost':
-            items = self.lost_items.values()
-        else:
-            items = self.found_items.values()
-        
-        categories = set()
-        for item in items:
-            categories.add(item.category)
-        return sorted(categories)
-
-def search_category(self, category):
-    """Binary search in BST for specific category"""
-    return self._search_recursive(self.root, category)
-
-def _search_recursive(self, node, category):
-    """Recursive binary search helper"""
-    if node is None:
-        return []
-    if category == node.key:
-        return [node.value]
-    elif category < node.key:
-        return self._search_recursive(node.left, category)
-    else:
-        return self._search_recursive(node.right, category)
-
-def bfs_search(self, category):
-    """Breadth-First Search through category tree"""
-    from collections import deque
-    queue = deque([self.root])
-    results = []
-    
-    while queue:
-        node = queue.popleft()
-        if node and node.key == category:
-            results.append(node.value)
-        if node and node.left:
-            queue.append(node.left)
-        if node and node.right:
-            queue.append(node.right)
-    
-    return results
+            return self.lost_categories.categories()
+        return self.found_categories.categories()
+    
+    def get_items_by_category(self, category, item_type='lost', newest_first=False):
+        """Yield every item in a category, ordered by date"""
+        index = self.lost_categories if item_type == 'lost' else self.found_categories
+        return index.items_in(category, reverse=newest_first)
@@ -0,0 +1,159 @@
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import islice
+
+from sqlalchemy import select
+
+from models import db, User, LostItem, allocate_item_ids, bump_data_versions, write_transaction
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = ('item_id', 'name', 'desc', 'category', 'location', 'date', 'reporter', 'created_at')
+REQUIRED = ('name', 'category', 'location', 'date')
+
+
+def format_for(path):
+    """File format from a path's extension; CSV unless it ends in .jsonl or .ndjson"""
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Open path for text reading or writing, with '-' meaning stdin or stdout"""
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    # utf-8-sig skips the byte order mark spreadsheet programs put in front of CSV exports
+    with open(path, mode, encoding='utf-8-sig' if mode == 'r' else 'utf-8', newline='') as f:
+        yield f
+
+
+class UnreadableRecord:
+    """Stands in for a record that could not be parsed, so later records keep their numbers"""
+    def __init__(self, problem):
+        self.problem = problem
+
+
+def read_records(stream, file_format):
+    """Yield one dict per CSV row or JSON line, reading the stream as it goes
+    
+    A JSON line that does not parse is yielded as an UnreadableRecord, for import_items()
+    to skip and report like any other bad record.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield UnreadableRecord(f"invalid JSON ({error})")
+
+
+def write_records(records, stream, file_format):
+    """Write dicts with the FIELDS as CSV or JSON Lines; returns how many were written"""
+    count = 0
+    writer = csv.DictWriter(stream, FIELDS) if file_format == 'csv' else None
+    if writer:
+        writer.writeheader()
+    for record in records:
+        if writer:
+            writer.writerow(record)
+        else:
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def export_records(model, chunk_size=1000):
+    """Yield every item of one side as a dict of FIELDS, oldest first, fetching chunk_size rows at a time"""
+    rows = db.session.execute(
+        select(model.item_id, model.name, model.desc, model.category, model.location, model.date, User.username,
+               model.created_at)
+        .join(User, model.user_id == User.id)
+        .order_by(model.id)
+        .execution_options(yield_per=chunk_size))
+    for item_id, name, desc, category, location, day, username, created_at in rows:
+        yield {
+            'item_id': item_id, 'name': name, 'desc': desc, 'category': category, 'location': location,
+            'date': day, 'reporter': username, 'created_at': created_at.isoformat() if created_at else '',
+        }
+
+
+def _item_row(record):
+    """Column values for one imported record, or (None, reason) if it cannot be imported"""
+    if isinstance(record, UnreadableRecord):
+        return None, record.problem
+    if not isinstance(record, dict):
+        return None, f"expected an object, got {json.dumps(record)[:40]}"
+    values = {field: str(record.get(field) or '').strip() for field in REQUIRED + ('desc', 'reporter')}
+    missing = [field for field in REQUIRED if not values[field]]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    try:
+        date.fromisoformat(values['date'])
+    except ValueError:
+        return None, f"date {values['date']!r} is not YYYY-MM-DD"
+    try:
+        created_at = datetime.fromisoformat(str(record.get('created_at') or '').strip())
+    except ValueError:
+        created_at = datetime.utcnow()
+    values['created_at'] = created_at
+    return values, None
+
+
+def _user_ids(usernames, known):
+    """Fill known ({username: user id}) with the users among usernames it does not have yet"""
+    missing = {username for username in usernames if username and username not in known}
+    if missing:
+        known.update(db.session.query(User.username, User.id).filter(User.username.in_(missing)))
+        known.update((username, None) for username in missing if username not in known)
+
+
+def import_items(model, records, default_user_id, chunk_size=1000, on_skip=None, progress=None):
+    """Insert records (dicts with the FIELDS) as items of one side; returns (imported, skipped)
+
+    Records are consumed chunk_size at a time. Each chunk reserves its item IDs with one
+    allocate_item_ids() call and goes in with one executemany INSERT and one commit, so
+    memory stays flat however long the input is. Records keep no item_id of their own:
+    they get the next free IDs. Reporters are matched by username, falling back to
+    default_user_id. Matches are not scored here; the caller rebuilds them once at the end.
+    """
+    is_lost = model is LostItem
+    imported = skipped = 0
+    user_ids = {}
+    numbered = enumerate(records, 1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        rows = []
+        for number, record in chunk:
+            row, problem = _item_row(record)
+            if row is None:
+                skipped += 1
+                if on_skip:
+                    on_skip(number, problem)
+                continue
+            rows.append(row)
+        _user_ids([row['reporter'] for row in rows], user_ids)
+
+        def insert_chunk():
+            item_ids = allocate_item_ids('L' if is_lost else 'F', len(rows))
+            db.session.execute(model.__table__.insert(), [{
+                'item_id': item_id, 'name': row['name'], 'desc': row['desc'], 'category': row['category'],
+                'location': row['location'], 'date': row['date'], 'created_at': row['created_at'],
+                'user_id': user_ids.get(row['reporter']) or default_user_id,
+            } for item_id, row in zip(item_ids, rows)])
+            bump_data_versions('lost' if is_lost else 'found')
+            db.session.commit()
+
+        if rows:
+            write_transaction(insert_chunk)
+            imported += len(rows)
+        if progress:
+            progress(imported, skipped)
+    return imported, skipped
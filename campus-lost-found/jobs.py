@@ -0,0 +1,72 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Bounded in-process job queue served by a pool of worker threads"""
+    def __init__(self, workers=2, max_depth=100, name='jobs'):
+        self.workers = workers
+        self.name = name
+        self.jobs = queue.Queue(maxsize=max_depth)
+        self.threads = []
+        self.pid = None
+        self.lock = threading.Lock()
+        self.closed = False
+        atexit.register(self.shutdown)
+
+    def start(self):
+        """Start the worker threads (again after a fork, since threads do not survive it)"""
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, func, *args, timeout=None):
+        """Queue func(*args); blocks up to timeout while full and returns False if still full"""
+        if self.closed:
+            return False
+        self.start()
+        try:
+            self.jobs.put((func, args), timeout=timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                func, args = job
+                func(*args)
+            except Exception:
+                logger.exception("Job %s failed", getattr(job[0], '__name__', job[0]))
+            finally:
+                self.jobs.task_done()
+
+    def depth(self):
+        return self.jobs.qsize()
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs, let the workers finish what is queued, then stop them"""
+        self.closed = True
+        if self.pid != os.getpid():
+            return
+        for _ in self.threads:
+            self.jobs.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+        self.threads = []
+        self.pid = None
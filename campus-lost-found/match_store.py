@@ -0,0 +1,272 @@
+import heapq
+import multiprocessing
+import time
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select
+from sqlalchemy.orm import joinedload
+from data_structures import LostAndFoundMatcher
+from models import db, LostItem, FoundItem, ItemMatch, bump_data_versions, write_transaction
+
+TOP_K = 10
+
+_worker_state = {}
+
+# Scratch tables of rematch_all(), outside db.metadata so create_all() leaves them alone
+_rematch_metadata = MetaData()
+_staged_matches = Table('item_match_staging', _rematch_metadata,
+                        Column('item_id', String(20), nullable=False),
+                        Column('match_item_id', String(20), nullable=False),
+                        Column('score', Integer, nullable=False))
+_rescored_items = Table('item_match_rescored', _rematch_metadata,
+                        Column('item_id', String(20), primary_key=True))
+
+
+def _entry_floors(model, top_k):
+    """Score a new item needs to enter each full top-k list of model's items, as {item_id: score}
+    
+    A new item loses ties to the matches already stored, so that is one more than the k-th
+    best stored score. Lists with fewer than k matches only need the threshold.
+    """
+    # One short index range per item (item_id, score), cheaper than ranking every stored row
+    kth = select(ItemMatch.score).where(ItemMatch.item_id == model.item_id) \
+        .order_by(ItemMatch.score.desc()).limit(1).offset(top_k - 1).scalar_subquery()
+    return {item_id: max(30, score + 1) for item_id, score in db.session.query(model.item_id, kth)
+            if score is not None}
+
+
+def _insert_rows(rows):
+    """Insert (item_id, match_item_id, score) rows that are not stored yet"""
+    if not rows:
+        return
+    existing = set(db.session.query(ItemMatch.item_id, ItemMatch.match_item_id).filter(
+        ItemMatch.item_id.in_({item_id for item_id, _, _ in rows}),
+        ItemMatch.match_item_id.in_({match_id for _, match_id, _ in rows})))
+    for item_id, match_id, score in rows:
+        if (item_id, match_id) not in existing:
+            existing.add((item_id, match_id))
+            db.session.add(ItemMatch(item_id=item_id, match_item_id=match_id, score=score))
+
+
+def _trim_lists(item_ids, top_k):
+    """Delete the rows that fell out of these items' top-k lists (ranked like get_matches)"""
+    if not item_ids:
+        return
+    db.session.flush()
+    for target_model in (LostItem, FoundItem):
+        rank = func.row_number().over(partition_by=ItemMatch.item_id,
+                                      order_by=(ItemMatch.score.desc(), target_model.id)).label('rank')
+        ranked = select(ItemMatch.id, rank) \
+            .join(target_model, target_model.item_id == ItemMatch.match_item_id) \
+            .where(ItemMatch.item_id.in_(item_ids)).subquery()
+        ItemMatch.query.filter(ItemMatch.id.in_(select(ranked.c.id).where(ranked.c.rank > top_k))) \
+            .delete(synchronize_session=False)
+
+
+def score_matches(matcher, item_id, is_lost, top_k=TOP_K):
+    """Score a new item once; returns the rows for its own and the other side's top-k lists"""
+    rows = [(item_id, match['item'].id, match['score'])
+            for match in matcher.find_matches(item_id, is_lost, limit=top_k)]
+
+    # The new item joins another item's list only if it beats that list's k-th best match,
+    # so each candidate is only scored as far as needed to tell
+    floors = _entry_floors(FoundItem if is_lost else LostItem, top_k)
+    rows.extend((match['item'].id, item_id, match['score'])
+                for match in matcher.find_reverse_matches(item_id, is_lost, floors))
+    return rows
+
+
+def store_matches(rows, top_k=TOP_K):
+    """Insert rows from score_matches() and commit; a short write after the slow scoring
+    
+    A list the new item joined drops its old k-th match in the same commit.
+    """
+    _insert_rows(rows)
+    _trim_lists({item_id for item_id, _, _ in rows}, top_k)
+    bump_data_versions('matches')
+    db.session.commit()
+
+
+def record_matches(matcher, item_id, is_lost, top_k=TOP_K):
+    """Score a new item once and store it in its own and the other side's top-k lists"""
+    store_matches(score_matches(matcher, item_id, is_lost, top_k), top_k)
+
+
+def forget_matches(matcher, item_id, is_lost, top_k=TOP_K):
+    """Drop a deleted item's matches and refill the lists it was part of"""
+    affected = [match_of for (match_of,) in
+                db.session.query(ItemMatch.item_id).filter(ItemMatch.match_item_id == item_id)]
+    rows = []
+    for target_id in affected:
+        for match in matcher.find_matches(target_id, not is_lost, limit=top_k):
+            rows.append((target_id, match['item'].id, match['score']))
+
+    # Scoring is done before the first write, so the write lock is only held briefly
+    ItemMatch.query.filter((ItemMatch.item_id == item_id) | (ItemMatch.match_item_id == item_id)) \
+        .delete(synchronize_session=False)
+    _insert_rows(rows)
+    _trim_lists(affected, top_k)
+    bump_data_versions('matches')
+    db.session.commit()
+
+
+def rebuild_matches(matcher, top_k=TOP_K):
+    """Recompute every stored match from the matcher's current items"""
+    ItemMatch.query.delete(synchronize_session=False)
+    for source_items, is_lost in ((matcher.lost_items, True), (matcher.found_items, False)):
+        for item_id in list(source_items):
+            db.session.add_all(ItemMatch(item_id=item_id, match_item_id=match['item'].id, score=match['score'])
+                               for match in matcher.find_matches(item_id, is_lost, limit=top_k))
+    bump_data_versions('matches')
+    db.session.commit()
+
+
+def get_matches(item_id, is_lost, top_k=TOP_K):
+    """Return the stored top-k matches for an item as (item, score) rows"""
+    target_model = FoundItem if is_lost else LostItem
+    return db.session.query(target_model, ItemMatch.score) \
+        .join(ItemMatch, ItemMatch.match_item_id == target_model.item_id) \
+        .options(joinedload(target_model.reporter)) \
+        .filter(ItemMatch.item_id == item_id) \
+        .order_by(ItemMatch.score.desc(), target_model.id) \
+        .limit(top_k).all()
+
+
+def _init_rematch_worker(found_items, top_k):
+    # Workers only ever score with the exact backend; rematch_all keeps vector runs in process
+    _worker_state['matcher'] = LostAndFoundMatcher()
+    _worker_state['found_items'] = found_items
+    _worker_state['top_k'] = top_k
+
+
+def _rematch_chunk(lost_chunk):
+    """Score a chunk of lost items against every found item (runs in a pool worker)"""
+    similarity_at_least = _worker_state['matcher'].similarity_at_least
+    found_items = _worker_state['found_items']
+    top_k = _worker_state['top_k']
+    # Each lost item keeps a min-heap of its best (score, -found_seq); once it is full, only
+    # a higher score than its k-th best can matter, so that is the floor for later pairs
+    lost_heaps = {lost_seq: [] for lost_seq, _ in lost_chunk}
+    lost_floors = {lost_seq: 30 for lost_seq, _ in lost_chunk}  # Minimum threshold
+    found_scores = {}
+    # Found items in the outer loop, so each one's cached features serve the whole chunk
+    for found_seq, found_item in enumerate(found_items):
+        for lost_seq, lost_item in lost_chunk:
+            # Each side keeps the score from its own point of view
+            score = similarity_at_least(lost_item, found_item, lost_floors[lost_seq])
+            if score is not None:
+                heap = lost_heaps[lost_seq]
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (score, -found_seq))
+                else:
+                    heapq.heapreplace(heap, (score, -found_seq))
+                if len(heap) == top_k:
+                    lost_floors[lost_seq] = max(30, heap[0][0] + 1)
+            # The found side's lists span every chunk, so here only the threshold applies
+            score = similarity_at_least(found_item, lost_item, 30)
+            if score is not None:
+                found_scores.setdefault(found_seq, []).append((-score, lost_seq))
+    lost_tops = [(lost_seq, sorted((-score, -neg_seq) for score, neg_seq in heap))
+                 for lost_seq, heap in lost_heaps.items()]
+    found_tops = {found_seq: heapq.nsmallest(top_k, scores) for found_seq, scores in found_scores.items()}
+    return lost_tops, found_tops, len(lost_chunk) * len(found_items)
+
+
+def _stage_rows(rows):
+    if rows:
+        db.session.execute(_staged_matches.insert(), rows)
+        db.session.commit()
+
+
+def _swap_in_staged(top_k):
+    """Replace the rescored items' matches with the staged rows, in one transaction"""
+    rescored = select(_rescored_items.c.item_id)
+    live = select(LostItem.item_id).union(select(FoundItem.item_id))
+    ItemMatch.query.filter(ItemMatch.item_id.in_(rescored), ItemMatch.match_item_id.in_(rescored)) \
+        .delete(synchronize_session=False)
+    # Items deleted during the run already had their matches forgotten
+    db.session.execute(ItemMatch.__table__.insert().from_select(
+        ['item_id', 'match_item_id', 'score'],
+        select(_staged_matches.c.item_id, _staged_matches.c.match_item_id, _staged_matches.c.score)
+        .where(_staged_matches.c.item_id.in_(live), _staged_matches.c.match_item_id.in_(live))))
+    # Items reported during the run were scored as usual and may have pushed lists past k
+    joined = db.session.scalars(select(ItemMatch.item_id).distinct()
+                                .where(ItemMatch.match_item_id.not_in(rescored)))
+    _trim_lists(set(joined), top_k)
+    _rematch_metadata.drop_all(db.session.connection())
+    bump_data_versions('matches')
+    db.session.commit()
+
+
+def rematch_all(matcher, workers=None, chunk_size=64, batch_size=5000, top_k=TOP_K, progress=None):
+    """Rescore the full lost x found cross product and rewrite the match table
+
+    The exact backend fans the work out over a process pool; the vector backend scores in
+    this process with the matcher's own vector indexes.
+
+    New rows are staged in a scratch table and swapped in with one transaction at the end,
+    so pages keep the old matches meanwhile and a crash leaves them in place. Returns
+    (pairs scored, seconds taken).
+    """
+    lost_items = list(matcher.lost_items.values())
+    found_items = list(matcher.found_items.values())
+    indexed = list(enumerate(lost_items))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+    started = time.perf_counter()
+    pairs_scored = 0
+    found_tops = {}
+    batch = []
+
+    connection = db.session.connection()
+    _rematch_metadata.drop_all(connection)  # Left over from a run that did not finish
+    _rematch_metadata.create_all(connection)
+    if lost_items or found_items:
+        db.session.execute(_rescored_items.insert(), [{'item_id': item.id} for item in lost_items + found_items])
+    db.session.commit()
+
+    if matcher.backend == 'vector':
+        # The vector backend already scores one item against a whole side in a single NumPy
+        # pass, and its Dice scores differ from the exact ones the pool workers compute, so
+        # each side's lists come from the matcher itself
+        for source_items, is_lost in ((lost_items, True), (found_items, False)):
+            for item in source_items:
+                batch.extend({'item_id': item.id, 'match_item_id': match['item'].id, 'score': match['score']}
+                             for match in matcher.find_matches(item.id, is_lost, limit=top_k))
+                if len(batch) >= batch_size:
+                    _stage_rows(batch)
+                    batch = []
+            if is_lost:
+                pairs_scored = len(lost_items) * len(found_items)  # Both passes score the same pairs
+            if progress:
+                progress(pairs_scored, time.perf_counter() - started)
+        _stage_rows(batch)
+        write_transaction(lambda: _swap_in_staged(top_k))
+        return pairs_scored, time.perf_counter() - started
+
+    with multiprocessing.Pool(workers, initializer=_init_rematch_worker, initargs=(found_items, top_k)) as pool:
+        for lost_tops, chunk_found_tops, chunk_pairs in pool.imap_unordered(_rematch_chunk, chunks):
+            pairs_scored += chunk_pairs
+
+            # Lost items' lists are complete per chunk and are written straight away
+            for lost_seq, top in lost_tops:
+                batch.extend({'item_id': lost_items[lost_seq].id, 'match_item_id': found_items[found_seq].id,
+                              'score': -neg_score} for neg_score, found_seq in top)
+            if len(batch) >= batch_size:
+                _stage_rows(batch)
+                batch = []
+
+            # Found items' lists span every chunk, so they are merged as chunks arrive
+            for found_seq, top in chunk_found_tops.items():
+                found_tops[found_seq] = heapq.nsmallest(top_k, found_tops.get(found_seq, []) + top)
+
+            if progress:
+                progress(pairs_scored, time.perf_counter() - started)
+
+    for found_seq, top in found_tops.items():
+        batch.extend({'item_id': found_items[found_seq].id, 'match_item_id': lost_items[lost_seq].id,
+                      'score': -neg_score} for neg_score, lost_seq in top)
+        if len(batch) >= batch_size:
+            _stage_rows(batch)
+            batch = []
+    _stage_rows(batch)
+    write_transaction(lambda: _swap_in_staged(top_k))
+
+    return pairs_scored, time.perf_counter() - started
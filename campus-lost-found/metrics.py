@@ -0,0 +1,165 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A named metric with optional labels; metric.labels(...) returns the series to update
+
+    new_series() makes the series for each new combination of label values.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames, new_series):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.new_series = new_series
+        self.series = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values):
+        series = self.series.get(values)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(values, self.new_series())
+        return series
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in sorted(self.series.items()):
+            lines.extend(series.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterSeries:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_label_text(labelnames, values)} {_number(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames, _CounterSeries)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _HistogramSeries:
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        # counts are per bucket here and made cumulative when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name, labelnames, values):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            lines.append(f"{name}_bucket{_label_text(labelnames, values, [('le', _number(bound))])} {total}")
+        lines.append(f"{name}_sum{_label_text(labelnames, values)} {_number(self.sum)}")
+        lines.append(f"{name}_count{_label_text(labelnames, values)} {total}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, lambda: _HistogramSeries(self.buckets))
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Requests (labelled by Flask endpoint, so URL parameters do not create new series)
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request latency.', ('endpoint', 'method'))
+REQUESTS = Counter('http_requests_total', 'Requests served.', ('endpoint', 'method', 'status'))
+REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Time spent in SQL statements per request.',
+                               ('endpoint',))
+REQUEST_DB_STATEMENTS = Histogram('http_request_db_statements', 'SQL statements executed per request.',
+                                  ('endpoint',), buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+
+# Matching
+FIND_MATCHES_SECONDS = Histogram('matcher_find_matches_seconds', 'Time to pick the top matches of an item.',
+                                 ('backend',))
+SIMILARITY_PAIRS = Counter('matcher_similarity_pairs_total',
+                           'Item pairs considered, by whether the score was needed or ruled out early.',
+                           ('result',))
+RATIO_CALLS = Counter('matcher_ratio_calls_total', 'Full SequenceMatcher.ratio() calls.')
+
+# Autocomplete
+TRIE_LOOKUP_SECONDS = Histogram('autocomplete_lookup_seconds', 'Trie lookup time per autocomplete query.',
+                                ('mode',), buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                                                    0.025, 0.05, 0.1))
+
+# Response cache
+RESPONSE_CACHE_LOOKUPS = Counter('response_cache_lookups_total',
+                                 'Response cache lookups, by route and result (hit, shared_hit or miss).',
+                                 ('route', 'result'))
@@ -0,0 +1,97 @@
+from sqlalchemy import text
+
+# Schema upgrades for existing databases, applied in order. db.create_all() only creates
+# missing tables, so anything added to an existing table (like an index) goes here too.
+# PRAGMA user_version records the last version applied.
+MIGRATIONS = [
+    (1, "Indexes for hot item and match queries", [
+        "CREATE INDEX IF NOT EXISTS ix_lost_item_user_id ON lost_item (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_lost_item_created_at_id ON lost_item (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_lost_item_category_created_at_id ON lost_item (category, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_lost_item_category_date ON lost_item (category, date)",
+        "CREATE INDEX IF NOT EXISTS ix_found_item_user_id ON found_item (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_found_item_created_at_id ON found_item (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_found_item_category_created_at_id ON found_item (category, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_found_item_category_date ON found_item (category, date)",
+        "DROP INDEX IF EXISTS ix_item_match_item_id",
+        "CREATE INDEX IF NOT EXISTS ix_item_match_item_id_score ON item_match (item_id, score)",
+        "ANALYZE",
+    ]),
+    (2, "Item ID sequences, continuing after the highest existing IDs", [
+        "CREATE TABLE IF NOT EXISTS id_sequence (name VARCHAR(20) NOT NULL PRIMARY KEY, value INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO id_sequence (name, value) "
+        "SELECT 'L', COALESCE(MAX(CAST(SUBSTR(item_id, 2) AS INTEGER)), 0) FROM lost_item",
+        "INSERT OR IGNORE INTO id_sequence (name, value) "
+        "SELECT 'F', COALESCE(MAX(CAST(SUBSTR(item_id, 2) AS INTEGER)), 0) FROM found_item",
+    ]),
+    # External-content FTS5 tables: they index the item rows without a second copy of the
+    # text, and triggers keep them in step with every insert, update and delete
+    (3, "Full-text search tables over item name, description, category and location", [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS lost_item_fts USING fts5(name, \"desc\", category, location, "
+        "content='lost_item', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS lost_item_fts_insert AFTER INSERT ON lost_item BEGIN "
+        "INSERT INTO lost_item_fts (rowid, name, \"desc\", category, location) "
+        "VALUES (new.id, new.name, new.\"desc\", new.category, new.location); END",
+        "CREATE TRIGGER IF NOT EXISTS lost_item_fts_delete AFTER DELETE ON lost_item BEGIN "
+        "INSERT INTO lost_item_fts (lost_item_fts, rowid, name, \"desc\", category, location) "
+        "VALUES ('delete', old.id, old.name, old.\"desc\", old.category, old.location); END",
+        "CREATE TRIGGER IF NOT EXISTS lost_item_fts_update AFTER UPDATE ON lost_item BEGIN "
+        "INSERT INTO lost_item_fts (lost_item_fts, rowid, name, \"desc\", category, location) "
+        "VALUES ('delete', old.id, old.name, old.\"desc\", old.category, old.location); "
+        "INSERT INTO lost_item_fts (rowid, name, \"desc\", category, location) "
+        "VALUES (new.id, new.name, new.\"desc\", new.category, new.location); END",
+        "INSERT INTO lost_item_fts (lost_item_fts) VALUES ('rebuild')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS found_item_fts USING fts5(name, \"desc\", category, location, "
+        "content='found_item', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS found_item_fts_insert AFTER INSERT ON found_item BEGIN "
+        "INSERT INTO found_item_fts (rowid, name, \"desc\", category, location) "
+        "VALUES (new.id, new.name, new.\"desc\", new.category, new.location); END",
+        "CREATE TRIGGER IF NOT EXISTS found_item_fts_delete AFTER DELETE ON found_item BEGIN "
+        "INSERT INTO found_item_fts (found_item_fts, rowid, name, \"desc\", category, location) "
+        "VALUES ('delete', old.id, old.name, old.\"desc\", old.category, old.location); END",
+        "CREATE TRIGGER IF NOT EXISTS found_item_fts_update AFTER UPDATE ON found_item BEGIN "
+        "INSERT INTO found_item_fts (found_item_fts, rowid, name, \"desc\", category, location) "
+        "VALUES ('delete', old.id, old.name, old.\"desc\", old.category, old.location); "
+        "INSERT INTO found_item_fts (rowid, name, \"desc\", category, location) "
+        "VALUES (new.id, new.name, new.\"desc\", new.category, new.location); END",
+        "INSERT INTO found_item_fts (found_item_fts) VALUES ('rebuild')",
+    ]),
+    # Every worker process mirrors the items in memory and catches up from this log. AUTOINCREMENT,
+    # so a change ID is never reused even after the newest rows are deleted
+    (4, "Log of item inserts, updates and deletes, filled by triggers", [
+        "CREATE TABLE IF NOT EXISTS item_change (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "item_id VARCHAR(20) NOT NULL, is_lost BOOLEAN NOT NULL)",
+        "CREATE TRIGGER IF NOT EXISTS lost_item_change_insert AFTER INSERT ON lost_item BEGIN "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (new.item_id, 1); END",
+        "CREATE TRIGGER IF NOT EXISTS lost_item_change_delete AFTER DELETE ON lost_item BEGIN "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (old.item_id, 1); END",
+        "CREATE TRIGGER IF NOT EXISTS lost_item_change_update AFTER UPDATE ON lost_item BEGIN "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (old.item_id, 1); "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (new.item_id, 1); END",
+        "CREATE TRIGGER IF NOT EXISTS found_item_change_insert AFTER INSERT ON found_item BEGIN "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (new.item_id, 0); END",
+        "CREATE TRIGGER IF NOT EXISTS found_item_change_delete AFTER DELETE ON found_item BEGIN "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (old.item_id, 0); END",
+        "CREATE TRIGGER IF NOT EXISTS found_item_change_update AFTER UPDATE ON found_item BEGIN "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (old.item_id, 0); "
+        "INSERT INTO item_change (item_id, is_lost) VALUES (new.item_id, 0); END",
+    ]),
+]
+
+
+def schema_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def upgrade(connection):
+    """Apply pending migrations in order and return the versions applied"""
+    applied = []
+    current = schema_version(connection)
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            connection.execute(text(statement))
+        connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+        applied.append(version)
+    return applied
@@ -1,10 +1,105 @@
+import random
+import threading
+import time
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from datetime import datetime
+from sqlalchemy import cast, event, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
+_active_counters = threading.local()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_active_counters, 'stack', ()):
+        counter.statements.append(statement)
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['statement_started'].pop()
+    for counter in getattr(_active_counters, 'stack', ()):
+        counter.seconds += time.perf_counter() - started
+
+
+@event.listens_for(Engine, 'handle_error')
+def _forget_statement_time(exception_context):
+    started = exception_context.connection is not None and \
+        exception_context.connection.info.get('statement_started')
+    if started:
+        started.pop()
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Set the PRAGMAs ({name: value}) on every connection engine opens from now on"""
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def is_busy(error):
+    """Whether a database error means another connection holds the lock, so retrying can succeed"""
+    code = getattr(error.orig, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (5, 6)  # SQLITE_BUSY and SQLITE_LOCKED, with their extended codes
+    return 'database is locked' in str(error.orig)
+
+
+def write_transaction(work, attempts=4, backoff=0.05):
+    """Run work(), which writes and commits, retrying it from the start while the database is busy
+    
+    Any read transaction still open is ended first, so the write transaction starts at its
+    first write and waits on busy_timeout instead of failing to upgrade a stale snapshot.
+    work() must redo its reads on each attempt. Returns what work() returns.
+    """
+    db.session.commit()
+    for attempt in range(attempts):
+        try:
+            return work()
+        except OperationalError as error:
+            db.session.rollback()
+            if not is_busy(error) or attempt == attempts - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class QueryCounter:
+    """Records the SQL statements executed on this thread while active, and the time they took
+    
+        with QueryCounter() as queries:
+            client.get('/lost')
+        assert len(queries) <= 4
+    """
+    def __init__(self):
+        self.statements = []
+        self.seconds = 0.0
+    
+    def start(self):
+        if not hasattr(_active_counters, 'stack'):
+            _active_counters.stack = []
+        _active_counters.stack.append(self)
+        return self.statements
+    
+    def stop(self):
+        _active_counters.stack.remove(self)
+        return self.statements
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+
 
 class User(db.Model):
     """User model"""
@@ -40,6 +135,14 @@ class LostItem(db.Model):
     
     # Foreign key
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    # Indexes for the list, profile and matching queries
+    __table_args__ = (
+        db.Index('ix_lost_item_user_id', 'user_id'),
+        db.Index('ix_lost_item_created_at_id', 'created_at', 'id'),
+        db.Index('ix_lost_item_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_lost_item_category_date', 'category', 'date'),
+    )
 
 
 class FoundItem(db.Model):
@@ -56,3 +159,123 @@ class FoundItem(db.Model):
     
     # Foreign key
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    # Indexes for the list, profile and matching queries
+    __table_args__ = (
+        db.Index('ix_found_item_user_id', 'user_id'),
+        db.Index('ix_found_item_created_at_id', 'created_at', 'id'),
+        db.Index('ix_found_item_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_found_item_category_date', 'category', 'date'),
+    )
+
+
+class ItemMatch(db.Model):
+    """Precomputed top matches of each item, scored from that item's side"""
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.String(20), nullable=False)
+    match_item_id = db.Column(db.String(20), nullable=False, index=True)
+    score = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('item_id', 'match_item_id'),
+        db.Index('ix_item_match_item_id_score', 'item_id', 'score'),
+    )
+
+
+class MatchJob(db.Model):
+    """Items whose matches are still being computed"""
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.String(20), unique=True, nullable=False)
+    is_lost = db.Column(db.Boolean, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class IdSequence(db.Model):
+    """Monotonic counters behind item IDs (L001, F001, ...); numbers are never reused"""
+    name = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ItemChange(db.Model):
+    """An item inserted, updated or deleted; rows are written by triggers (migration 4)"""
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.String(20), nullable=False)
+    is_lost = db.Column(db.Boolean, nullable=False)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class DataVersion(db.Model):
+    """Counters bumped by every commit that changes one kind of data ('lost', 'found', 'matches')
+    
+    Cached responses are keyed by the versions they were built from, so a bump makes them stale.
+    """
+    name = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PhotoBlob(db.Model):
+    """A stored photo file, named by the SHA-256 of its content and shared by every item using it"""
+    digest = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(200), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def add_photo_reference(digest, filename, size):
+    """Count one more item using a stored photo (inside the current transaction)
+    
+    Returns the filename the photo is stored under, which is the one it was first
+    uploaded with if the same content was uploaded before.
+    """
+    upsert = sqlite_insert(PhotoBlob).values(digest=digest, filename=filename, size=size, refcount=1,
+                                             created_at=datetime.utcnow())
+    upsert = upsert.on_conflict_do_update(index_elements=[PhotoBlob.digest],
+                                          set_={'refcount': PhotoBlob.refcount + 1})
+    return db.session.execute(upsert.returning(PhotoBlob.filename)).scalar()
+
+
+def release_photo_reference(digest):
+    """Count one item fewer using a stored photo; returns True if that was the last reference"""
+    drop = update(PhotoBlob).where(PhotoBlob.digest == digest) \
+        .values(refcount=PhotoBlob.refcount - 1).returning(PhotoBlob.refcount)
+    remaining = db.session.execute(drop).scalar()
+    if remaining is None:
+        return False
+    if remaining <= 0:
+        PhotoBlob.query.filter_by(digest=digest).delete()
+        return True
+    return False
+
+
+def bump_data_versions(*names):
+    """Mark kinds of data as changed inside the current transaction; takes effect on commit"""
+    for name in names:
+        upsert = sqlite_insert(DataVersion).values(name=name, value=1)
+        upsert = upsert.on_conflict_do_update(index_elements=[DataVersion.name],
+                                              set_={'value': DataVersion.value + 1})
+        db.session.execute(upsert)
+
+
+def data_versions():
+    """Current version of each kind of data, as {name: version}"""
+    return dict(db.session.query(DataVersion.name, DataVersion.value))
+
+
+def allocate_item_ids(prefix, count=1):
+    """Reserve count item IDs inside the current transaction; commit them together with the items
+    
+    The UPDATE takes SQLite's write lock, so concurrent workers never get the same number.
+    """
+    bump = update(IdSequence).where(IdSequence.name == prefix) \
+        .values(value=IdSequence.value + count).returning(IdSequence.value)
+    last = db.session.execute(bump).scalar()
+    if last is None:
+        # First use of this prefix: continue after the highest existing ID
+        model = LostItem if prefix == 'L' else FoundItem
+        highest = db.session.query(func.max(cast(func.substr(model.item_id, 2), db.Integer))).scalar()
+        db.session.add(IdSequence(name=prefix, value=(highest or 0) + count))
+        db.session.flush()
+        last = (highest or 0) + count
+    return [f"{prefix}{number:03d}" for number in range(last - count + 1, last + 1)]
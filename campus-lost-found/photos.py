@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import os
+import re
+import uuid
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is only needed for thumbnails; without it pages use the originals
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST = re.compile(r'[0-9a-f]{64}')
+
+# Resized variants of each upload, stored under <upload folder>/<variant>/<photo stem>.webp
+VARIANTS = {
+    'thumb': 480,  # longest side in pixels, for item cards and match and profile lists
+}
+
+
+def save_upload(file, folder, extension):
+    """Stream an uploaded file into folder in chunks, named by the SHA-256 of its content
+    
+    Returns (filename, digest, size). The data goes to a temporary name first and is
+    renamed into place once complete, so a half-written photo is never served or picked
+    up by the variant worker. The same content always gets the same name, so storing a
+    duplicate just rewrites identical bytes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = os.path.join(folder, f".{uuid.uuid4().hex}.part")
+    try:
+        with open(temp_path, 'wb') as f:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        filename = f"{digest.hexdigest()}.{extension}"
+        os.replace(temp_path, os.path.join(folder, filename))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return filename, digest.hexdigest(), size
+
+
+def photo_digest(photo):
+    """Content hash a stored photo is named by, or None for photos saved before content addressing"""
+    stem = os.path.splitext(photo)[0]
+    return stem if _DIGEST.fullmatch(stem) else None
+
+
+def variant_path(folder, photo, variant):
+    return os.path.join(folder, variant, f"{os.path.splitext(photo)[0]}.webp")
+
+
+def make_variants(folder, photo):
+    """Job: write every missing resized WebP variant of an uploaded photo"""
+    if Image is None:
+        return
+    try:
+        with Image.open(os.path.join(folder, photo)) as original:
+            original = ImageOps.exif_transpose(original)
+            for variant, size in VARIANTS.items():
+                path = variant_path(folder, photo, variant)
+                if os.path.exists(path):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                image = original.copy()
+                image.thumbnail((size, size))
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+                temp_path = f"{path}.part"
+                image.save(temp_path, 'WEBP', quality=80, method=4)
+                os.replace(temp_path, path)
+    except (OSError, ValueError):
+        logger.warning("Could not make variants of %s", photo, exc_info=True)
+
+
+def delete_photo(folder, photo):
+    """Remove an uploaded photo and all of its variants"""
+    for path in [os.path.join(folder, photo)] + [variant_path(folder, photo, variant) for variant in VARIANTS]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def photo_filename(photo, variant=None):
+    """Path of photo under the upload folder, or of its variant if variants can be made
+    
+    The variant path is used even before the worker has written the file (serve_photo
+    falls back to the original meanwhile), so pages linking it can be cached.
+    """
+    if variant and Image is not None:
+        return f"{variant}/{os.path.splitext(photo)[0]}.webp"
+    return photo
+
+
+def original_filename(folder, variant_filename, extensions):
+    """Filename of the upload a variant path was made from, or None if it is gone"""
+    stem = os.path.splitext(os.path.basename(variant_filename))[0]
+    for extension in extensions:
+        if os.path.isfile(os.path.join(folder, f"{stem}.{extension}")):
+            return f"{stem}.{extension}"
+    return None
@@ -0,0 +1,126 @@
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from metrics import RESPONSE_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """Least-recently-used cache of values in this process"""
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+class SqliteCache:
+    """Cache of JSON values in a SQLite file, shared by the worker processes of one host
+
+    Caching is best effort: a locked or broken file counts as a miss instead of failing
+    the request. The oldest entries go once there are more than max_entries.
+    """
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.writes = 0
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS response_cache "
+                               "(key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = sqlite3.connect(self.path, timeout=0.1)
+        return connection
+
+    def get(self, key):
+        try:
+            row = self._connect().execute("SELECT value FROM response_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            logger.warning("Shared response cache read failed", exc_info=True)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        try:
+            with self._connect() as connection:
+                # REPLACE gives the row a new rowid, so rowid order is write order
+                connection.execute("INSERT OR REPLACE INTO response_cache (key, value) VALUES (?, ?)",
+                                   (key, json.dumps(value)))
+                self.writes += 1
+                if self.writes % self.PRUNE_EVERY == 0:
+                    connection.execute("DELETE FROM response_cache WHERE rowid <= "
+                                       "(SELECT max(rowid) FROM response_cache) - ?", (self.max_entries,))
+        except sqlite3.Error:
+            logger.warning("Shared response cache write failed", exc_info=True)
+
+
+class ResponseCache:
+    """Values computed for read-only routes, keyed by route, arguments and data versions
+
+    Lookups try the in-process LRU, then the shared SQLite file if one is configured.
+    Writes bump the data versions (see models.bump_data_versions), which changes the key,
+    so stale entries are never read again and simply age out. Cached values must be
+    JSON-serializable and are shared between requests, so callers must not modify them.
+    """
+    def __init__(self, maxsize=1024, shared_path=None):
+        self.memory = MemoryCache(maxsize) if maxsize else None
+        self.shared = SqliteCache(shared_path) if shared_path else None
+
+    @property
+    def enabled(self):
+        return self.memory is not None or self.shared is not None
+
+    @staticmethod
+    def make_key(route, versions, path, args):
+        return json.dumps([route, versions, path, sorted(args)], separators=(',', ':'))
+
+    def get_or_compute(self, route, versions, path, args, compute, shared=True):
+        """Cached value for this route, path and (name, value) query arguments, or compute() stored
+        
+        shared=False keeps the value out of the shared file, for versions only this process knows.
+        """
+        key = self.make_key(route, versions, path, args)
+        shared = self.shared if shared else None
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                RESPONSE_CACHE_LOOKUPS.labels(route, 'hit').inc()
+                return value
+        if shared is not None:
+            value = shared.get(key)
+            if value is not None:
+                RESPONSE_CACHE_LOOKUPS.labels(route, 'shared_hit').inc()
+                if self.memory is not None:
+                    self.memory.set(key, value)
+                return value
+
+        RESPONSE_CACHE_LOOKUPS.labels(route, 'miss').inc()
+        value = compute()
+        if self.memory is not None:
+            self.memory.set(key, value)
+        if shared is not None:
+            shared.set(key, value)
+        return value
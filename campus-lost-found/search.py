@@ -0,0 +1,71 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+from models import db
+
+SEARCH_PAGE_SIZE = 20
+
+# BM25 weight of each indexed column: name, desc, category, location
+COLUMN_WEIGHTS = (10.0, 4.0, 2.0, 2.0)
+
+# Control characters that never occur in item text mark the highlighted terms, so the
+# text can be escaped before the <mark> tags go in
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(search_text):
+    """Turn what the user typed into an FTS5 MATCH expression, or None if there is nothing to search
+
+    Every word must appear and the last one may be a prefix, so results follow the user
+    as they type. Words are quoted, so FTS5 operators in the input are taken literally.
+    """
+    words = _TOKEN.findall(search_text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlighted(value):
+    return Markup(str(escape(value)).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def matching_ids(model, search_text):
+    """Subquery of the primary keys of model rows matching search_text, for use with in_()"""
+    table = f"{model.__tablename__}_fts"
+    return text(f"SELECT rowid FROM {table} WHERE {table} MATCH :fts_query") \
+        .bindparams(fts_query=fts_query(search_text))
+
+
+def search_items(model, search_text, page=1, per_page=SEARCH_PAGE_SIZE):
+    """BM25-ranked matches for search_text, one page at a time
+
+    Returns (results, has_more), where each result is a dict with the item, its rank
+    (lower is better) and the name and description with matched terms in <mark> tags.
+    """
+    query = fts_query(search_text)
+    if query is None:
+        return [], False
+    table = f"{model.__tablename__}_fts"
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    rows = db.session.execute(text(
+        f"SELECT rowid, bm25({table}, {weights}) AS rank, "
+        f"highlight({table}, 0, :start, :end), snippet({table}, 1, :start, :end, '…', 16) "
+        f"FROM {table} WHERE {table} MATCH :query ORDER BY rank, rowid LIMIT :limit OFFSET :offset"),
+        {'query': query, 'start': _MARK_START, 'end': _MARK_END,
+         'limit': per_page + 1, 'offset': (page - 1) * per_page}).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    items = {item.id: item for item in model.query.options(joinedload(model.reporter))
+             .filter(model.id.in_([row[0] for row in rows]))}
+    results = []
+    for item_pk, rank, name, desc in rows:
+        if item_pk in items:
+            results.append({'item': items[item_pk], 'rank': rank,
+                            'name': _highlighted(name), 'desc': _highlighted(desc)})
+    return results, has_more
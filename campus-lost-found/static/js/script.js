@@ -1,2 +1,33 @@
-// Empty for now - can add interactive features later
+// Campus Lost & Found scripts
 console.log('Campus Lost & Found System Loaded');
+
+// Infinite scroll for the lost/found item lists
+document.addEventListener('DOMContentLoaded', function () {
+    const grid = document.getElementById('itemsGrid');
+    const sentinel = document.getElementById('itemsSentinel');
+    if (!grid || !sentinel || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    let loading = false;
+    const observer = new IntersectionObserver(function (entries) {
+        const cursor = sentinel.dataset.nextCursor;
+        if (!entries[0].isIntersecting || loading || !cursor) {
+            return;
+        }
+        loading = true;
+        const params = new URLSearchParams(sentinel.dataset.query);
+        params.set('cursor', cursor);
+        fetch('/api/items/' + grid.dataset.type + '?' + params.toString())
+            .then(response => response.json())
+            .then(data => {
+                grid.insertAdjacentHTML('beforeend', data.html);
+                sentinel.dataset.nextCursor = data.next_cursor || '';
+                if (!data.next_cursor) {
+                    observer.disconnect();
+                }
+            })
+            .finally(() => { loading = false; });
+    }, { rootMargin: '400px' });
+    observer.observe(sentinel);
+});
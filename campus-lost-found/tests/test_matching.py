@@ -0,0 +1,85 @@
+"""find_matches against an exhaustive scan of every pair
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.catalog import generate_items  # noqa: E402
+from data_structures import LostAndFoundMatcher  # noqa: E402
+
+
+def exhaustive_matches(matcher, item_id, is_lost, limit=10):
+    """Top matches by scoring every item of the other side, ties oldest first"""
+    source = (matcher.lost_items if is_lost else matcher.found_items)[item_id]
+    targets = matcher.found_items if is_lost else matcher.lost_items
+    scored = [(matcher.calculate_similarity(source, target), position, target.id)
+              for position, target in enumerate(targets.values())]
+    scored = sorted((entry for entry in scored if entry[0] >= 30), key=lambda entry: (-entry[0], entry[1]))
+    return [(target_id, score) for score, _, target_id in scored[:limit]]
+
+
+def found_matches(matcher, item_id, is_lost, limit=10):
+    return [(match['item'].id, match['score']) for match in matcher.find_matches(item_id, is_lost, limit=limit)]
+
+
+def test_shared_fields_do_not_crowd_out_a_better_name():
+    matcher = LostAndFoundMatcher()
+    lost_id = matcher.add_lost_item('aXbXcXdX', 'aXbXcXdX', 'Electronics', 'Library', '2025-03-01', 'alice')
+    for number in range(300):
+        matcher.add_found_item(f"filler {number}", 'nothing in common', 'Electronics', 'Library', '2025-03-01',
+                               'bob')
+    better_id = matcher.add_found_item('aYbYcYdY', 'aYbYcYdY', 'Electronics', 'Library', '2025-03-01', 'bob')
+    
+    matches = found_matches(matcher, lost_id, True)
+    assert matches == exhaustive_matches(matcher, lost_id, True)
+    assert matches[0][0] == better_id
+
+
+def test_items_sharing_no_key_are_still_scored():
+    matcher = LostAndFoundMatcher()
+    lost_id = matcher.add_lost_item('Blue umbrella', 'Blue umbrella', 'Clothing', 'Gym', '2025-03-01', 'alice')
+    found_id = matcher.add_found_item('Blue umbrellas', 'Blue umbrella.', 'Other', 'Cafeteria', '2025-06-01', 'bob')
+    
+    assert found_matches(matcher, lost_id, True) == exhaustive_matches(matcher, lost_id, True)
+    assert [match['item'].id for match in matcher.find_reverse_matches(found_id, False)] == [lost_id]
+
+
+def test_top_ten_equals_exhaustive_scan():
+    matcher = LostAndFoundMatcher()
+    for side, add in (('lost', matcher.add_lost_item), ('found', matcher.add_found_item)):
+        for item in generate_items(200, seed=11, side=side):
+            add(item['name'], item['desc'], item['category'], item['location'], item['date'], item['user'])
+    
+    for item_id in list(matcher.lost_items)[:30]:
+        assert found_matches(matcher, item_id, True) == exhaustive_matches(matcher, item_id, True)
+    for item_id in list(matcher.found_items)[:30]:
+        assert found_matches(matcher, item_id, False) == exhaustive_matches(matcher, item_id, False)
+
+
+def test_similarity_at_least_agrees_with_calculate_similarity():
+    matcher = LostAndFoundMatcher()
+    for side, add in (('lost', matcher.add_lost_item), ('found', matcher.add_found_item)):
+        for item in generate_items(40, seed=5, side=side):
+            add(item['name'], item['desc'], item['category'], item['location'], item['date'], item['user'])
+    
+    for lost in matcher.lost_items.values():
+        for found in matcher.found_items.values():
+            for first, second in ((lost, found), (found, lost)):
+                score = matcher.calculate_similarity(first, second)
+                for floor in (0, 30, score, score + 1, 90):
+                    expected = score if score >= floor else None
+                    assert matcher.similarity_at_least(first, second, floor) == expected
+
+
+def test_other_limits_equal_exhaustive_scan():
+    matcher = LostAndFoundMatcher()
+    for side, add in (('lost', matcher.add_lost_item), ('found', matcher.add_found_item)):
+        for item in generate_items(150, seed=13, side=side):
+            add(item['name'], item['desc'], item['category'], item['location'], item['date'], item['user'])
+    
+    for item_id in list(matcher.lost_items)[:20]:
+        for limit in (1, 3):
+            assert found_matches(matcher, item_id, True, limit) == exhaustive_matches(matcher, item_id, True, limit)
+        assert found_matches(matcher, item_id, True, None) == exhaustive_matches(matcher, item_id, True, None)
@@ -0,0 +1,110 @@
+"""Routes through the test client, against a scratch instance of the benchmark catalog
+
+    python -m pytest tests
+"""
+import io
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+from benchmarks.catalog import generate_items, populate_database  # noqa: E402
+
+# Statements a page may run whatever the catalog size; the list pages and the profile
+# must not go back to one query per item or reporter
+SQL_QUERY_BUDGET = 5
+
+
+@pytest.fixture(scope='module')
+def webapp(tmp_path_factory):
+    """The app module, set up on a scratch instance holding 30 catalog items per side"""
+    folder = tmp_path_factory.mktemp('lost-found')
+    instance = folder / 'instance'
+    instance.mkdir()
+    from sqlalchemy import create_engine
+    from models import db
+    engine = create_engine(f"sqlite:///{instance / 'lost_and_found.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        populate_database(connection, 30, seed=11)
+    engine.dispose()
+
+    # The app sets itself up on import; point it at the scratch instance and upload folder
+    os.environ['INSTANCE_PATH'] = str(instance)
+    os.environ['RESPONSE_CACHE_SIZE'] = '0'
+    cwd = os.getcwd()
+    os.chdir(folder)
+    import app as webapp
+    webapp.app.config.update(TESTING=True, SQL_QUERY_BUDGET=SQL_QUERY_BUDGET)
+    with webapp.app.app_context():
+        webapp.rematch_all(webapp.matcher, workers=1)
+    yield webapp
+    os.chdir(cwd)
+
+
+def add_items(webapp, count, seed):
+    """Report count more catalog items per side as the existing reporters, then rescore"""
+    from models import db, User, LostItem, FoundItem, allocate_item_ids
+    with webapp.app.app_context():
+        users = User.query.order_by(User.id).all()
+        for model, side, prefix in ((LostItem, 'lost', 'L'), (FoundItem, 'found', 'F')):
+            item_ids = allocate_item_ids(prefix, count)
+            for number, (item_id, item) in enumerate(zip(item_ids, generate_items(count, seed, side))):
+                db.session.add(model(item_id=item_id, name=item['name'], desc=item['desc'],
+                                     category=item['category'], location=item['location'], date=item['date'],
+                                     user_id=users[number % len(users)].id))
+        db.session.commit()
+        webapp.sync_matcher()
+        webapp.rematch_all(webapp.matcher, workers=1)
+
+
+def log_in(webapp, client, item_id):
+    """Sign the test client in as the reporter of item_id"""
+    from models import LostItem
+    with webapp.app.app_context():
+        reporter = LostItem.query.filter_by(item_id=item_id).one().reporter
+        with client.session_transaction() as session:
+            session.update(logged_in=True, user_id=reporter.id, username=reporter.username, name=reporter.name)
+
+
+def statement_counts(client, pages):
+    from models import QueryCounter
+    counts = {}
+    for page in pages:
+        with QueryCounter() as statements:
+            response = client.get(page)
+        assert response.status_code == 200, page
+        counts[page] = len(statements)
+    return counts
+
+
+def test_pages_run_a_fixed_number_of_statements_as_the_catalog_grows(webapp):
+    client = webapp.app.test_client()
+    log_in(webapp, client, 'L001')
+    pages = ['/lost', '/found', '/api/items/lost', '/matches/L001/lost', '/profile']
+
+    small = statement_counts(client, pages)
+    add_items(webapp, 150, seed=12)
+    large = statement_counts(client, pages)
+
+    assert large == small
+    assert max(large.values()) <= SQL_QUERY_BUDGET
+
+
+def test_photo_with_a_non_ascii_name_is_saved(webapp):
+    from models import LostItem
+    client = webapp.app.test_client()
+    log_in(webapp, client, 'L002')
+    form = {'name': 'Blue umbrella', 'desc': 'Folding, with a wooden handle', 'category': 'Other',
+            'location': 'Library', 'date': '2025-03-01',
+            'photo': (io.BytesIO(b'\xff\xd8\xff\xe0 photo'), '照片.JPG')}
+
+    response = client.post('/report-lost', data=form, content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    with webapp.app.app_context():
+        item = LostItem.query.filter_by(name='Blue umbrella').one()
+    assert item.photo.endswith('.jpg')
+    assert os.path.exists(os.path.join(webapp.app.config['UPLOAD_FOLDER'], item.photo))
@@ -0,0 +1,141 @@
+"""The radix Trie against brute-force searches over a plain Counter of its words
+
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_structures import Trie  # noqa: E402
+
+
+def random_word(rng, alphabet='abc', max_length=5):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, max_length)))
+
+
+def expected_prefix(counts, prefix, top_k):
+    """Words starting with prefix, most inserted first, ties alphabetical"""
+    words = [word for word in counts if word.startswith(prefix)]
+    return sorted(words, key=lambda word: (-counts[word], word))[:top_k]
+
+
+def all_prefixes(alphabet='abc', max_length=5):
+    prefixes = ['']
+    for length in range(max_length):
+        prefixes += [prefix + char for prefix in prefixes if len(prefix) == length for char in alphabet]
+    return prefixes[1:]
+
+
+def check_trie(trie, counts):
+    assert len(trie) == len(counts)
+    assert list(trie.items()) == sorted(counts.items())
+    for prefix in all_prefixes():
+        assert trie.search_prefix(prefix) == expected_prefix(counts, prefix, trie.top_k), prefix
+
+    # Compressed: every node below the root holds a word or branches
+    stack = list(trie.root.children.values())
+    while stack:
+        node = stack.pop()
+        assert node.word is not None or len(node.children) > 1, node.label
+        stack.extend(node.children.values())
+
+
+def test_inserts_and_deletes_match_a_counter():
+    rng = random.Random(20250301)
+    for _ in range(40):
+        trie = Trie(top_k=rng.randint(1, 4))
+        counts = Counter()
+        for _ in range(60):
+            word = random_word(rng)
+            if counts and rng.random() < 0.4:
+                word = rng.choice(sorted(counts))
+                count = rng.choice([None, 1, 2])
+                assert trie.delete(word.upper() if rng.random() < 0.2 else word, count)
+                counts[word] = 0 if count is None else counts[word] - count
+                if counts[word] <= 0:
+                    del counts[word]
+            elif rng.random() < 0.1:
+                assert trie.delete(word) == (word in counts)
+                counts.pop(word, None)
+            else:
+                count = rng.randint(1, 3)
+                trie.insert(word.upper() if rng.random() < 0.2 else word, count)
+                counts[word] += count
+            check_trie(trie, counts)
+
+
+def test_from_counts_matches_repeated_inserts():
+    rng = random.Random(20250302)
+    for _ in range(40):
+        pairs = [(random_word(rng, 'abcAB'), rng.randint(1, 5)) for _ in range(rng.randint(0, 40))]
+        top_k = rng.randint(1, 4)
+        built = Trie.from_counts(pairs, top_k)
+        inserted = Trie(top_k)
+        counts = Counter()
+        for word, count in pairs:
+            inserted.insert(word, count)
+            counts[word.lower()] += count
+
+        check_trie(built, counts)
+        check_trie(inserted, counts)
+
+        # Both stay correct as the catalog changes afterwards
+        for word in rng.sample(sorted(counts), min(len(counts), 5)):
+            built.delete(word)
+            del counts[word]
+            check_trie(built, counts)
+        for _ in range(5):
+            word = random_word(rng)
+            built.insert(word)
+            counts[word] += 1
+            check_trie(built, counts)
+
+
+def osa_distance(a, b):
+    """Levenshtein distance plus adjacent transpositions (optimal string alignment)"""
+    rows = [list(range(len(b) + 1))] + [[i] + [0] * len(b) for i in range(1, len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[len(a)][len(b)]
+
+
+def expected_fuzzy(counts, query, max_distance, top_k):
+    """Words with some prefix within max_distance of query, closest first, then most inserted"""
+    best = {}
+    for word in counts:
+        distance = min(osa_distance(query, word[:length]) for length in range(1, len(word) + 1))
+        if distance <= max_distance:
+            best[word] = distance
+    return sorted(best, key=lambda word: (best[word], -counts[word], word))[:top_k]
+
+
+def test_fuzzy_search_matches_a_brute_force_scan():
+    rng = random.Random(20250303)
+    for _ in range(30):
+        trie = Trie(top_k=rng.randint(1, 5))
+        counts = Counter()
+        for _ in range(rng.randint(1, 40)):
+            word = random_word(rng, 'abcd', 7)
+            count = rng.randint(1, 4)
+            trie.insert(word, count)
+            counts[word] += count
+        for word in rng.sample(sorted(counts), len(counts) // 4):
+            trie.delete(word)
+            del counts[word]
+
+        for _ in range(20):
+            query = random_word(rng, 'abcd', 7)
+            max_distance = rng.choice([None, 0, 1, 2])
+            if max_distance is None:
+                expected_distance = 0 if len(query) < 3 else 1 if len(query) < 6 else 2
+            else:
+                # A distance of the whole query would match the empty prefix, which is never offered
+                max_distance = min(max_distance, len(query) - 1)
+                expected_distance = max_distance
+            assert trie.search_fuzzy(query, max_distance) == \
+                expected_fuzzy(counts, query, expected_distance, trie.top_k), (query, max_distance)
@@ -0,0 +1,149 @@
+import zlib
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the 'vector' match backend
+    np = None
+
+# Set bits per byte value, for NumPy versions before 2.0 that have no bitwise_count
+_BIT_COUNTS = None
+if np is not None and not hasattr(np, 'bitwise_count'):
+    _BIT_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+class VectorIndex:
+    """Items of one side encoded as arrays, so a query is scored against all of them at once
+
+    Names and descriptions become hashed character n-gram bit sets, packed eight to a
+    byte (dims / 8 bytes each), compared with the Dice coefficient (an approximation of
+    SequenceMatcher.ratio); category and location become integer codes and dates become
+    day ordinals. The 40/20/20/15/5 weights and the 30-point threshold are the same as
+    calculate_similarity.
+    """
+    def __init__(self, dims=512, gram_sizes=(2, 3), capacity=1024):
+        if np is None:
+            raise ImportError("The 'vector' match backend requires NumPy (pip install numpy)")
+        if dims % 8:
+            raise ValueError("dims must be a multiple of 8")
+        self.dims = dims
+        self.gram_sizes = gram_sizes
+        self.codes = {}
+        self.rows = {}
+        self.row_ids = []
+        self.free_rows = []
+        self.sequence = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """Grow every column to capacity rows, keeping existing rows"""
+        columns = [
+            ('names', (capacity, self.dims // 8), np.uint8, 0),
+            ('descs', (capacity, self.dims // 8), np.uint8, 0),
+            ('name_sizes', capacity, np.int32, 0),
+            ('desc_sizes', capacity, np.int32, 0),
+            ('categories', capacity, np.int32, -1),
+            ('locations', capacity, np.int32, -1),
+            ('days', capacity, np.int64, 0),
+            ('has_day', capacity, np.bool_, False),
+            ('active', capacity, np.bool_, False),
+            ('order', capacity, np.int64, 0),
+        ]
+        for attr, shape, dtype, fill in columns:
+            column = np.full(shape, fill, dtype=dtype)
+            old = getattr(self, attr, None)
+            if old is not None:
+                column[:len(old)] = old
+            setattr(self, attr, column)
+        self.row_ids.extend([None] * (capacity - len(self.row_ids)))
+
+    def _code(self, value):
+        return self.codes.setdefault(value.lower(), len(self.codes))
+
+    def _vector(self, text):
+        """Packed n-gram bits of text and how many bits are set"""
+        bits = np.zeros(self.dims, dtype=np.bool_)
+        text = text.lower()
+        for size in self.gram_sizes:
+            for i in range(len(text) - size + 1):
+                bits[zlib.crc32(text[i:i + size].encode('utf-8')) % self.dims] = True
+        return np.packbits(bits), int(bits.sum())
+
+    def encode(self, name, desc, category, location, date):
+        """Encode one item's features (also used for queries)"""
+        try:
+            day = datetime.strptime(date, '%Y-%m-%d').toordinal()
+        except (TypeError, ValueError):
+            day = None
+        name_vector, name_size = self._vector(name)
+        desc_vector, desc_size = self._vector(desc)
+        return (name_vector, name_size, desc_vector, desc_size,
+                self._code(category), self._code(location), day)
+
+    def add(self, item_id, name, desc, category, location, date):
+        if item_id in self.rows:
+            self.remove(item_id)
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            row = len(self.rows)
+            if row >= len(self.active):
+                self._allocate(len(self.active) * 2)
+        name_vector, name_size, desc_vector, desc_size, category, location, day = \
+            self.encode(name, desc, category, location, date)
+        self.names[row] = name_vector
+        self.name_sizes[row] = name_size
+        self.descs[row] = desc_vector
+        self.desc_sizes[row] = desc_size
+        self.categories[row] = category
+        self.locations[row] = location
+        self.days[row] = day or 0
+        self.has_day[row] = day is not None
+        self.active[row] = True
+        self.sequence += 1
+        self.order[row] = self.sequence
+        self.rows[item_id] = row
+        self.row_ids[row] = item_id
+
+    def remove(self, item_id):
+        row = self.rows.pop(item_id, None)
+        if row is None:
+            return
+        self.active[row] = False
+        self.row_ids[row] = None
+        self.free_rows.append(row)
+
+    def _dice(self, vectors, sizes, query, query_size):
+        shared = vectors & query
+        if _BIT_COUNTS is None:
+            overlap = np.bitwise_count(shared).sum(axis=1, dtype=np.int32)
+        else:
+            overlap = _BIT_COUNTS[shared].sum(axis=1, dtype=np.int32)
+        total = sizes + query_size
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Two empty strings are identical, like SequenceMatcher says
+            return np.where(total > 0, 2 * overlap / total, 1.0)
+
+    def top_matches(self, name, desc, category, location, date, limit=10, threshold=30):
+        """Return [(item_id, score)] best first, ties in insertion order"""
+        name_vector, name_size, desc_vector, desc_size, category, location, day = \
+            self.encode(name, desc, category, location, date)
+        used = len(self.rows) + len(self.free_rows)
+
+        score = self._dice(self.names[:used], self.name_sizes[:used], name_vector, name_size) * 40
+        score += self._dice(self.descs[:used], self.desc_sizes[:used], desc_vector, desc_size) * 20
+        score += (self.categories[:used] == category) * 20
+        score += (self.locations[:used] == location) * 15
+        if day is not None:
+            days_diff = np.abs(self.days[:used] - day)
+            score += np.where(self.has_day[:used] & (days_diff <= 7), 5 * (1 - days_diff / 7), 0)
+        score = np.floor(score).astype(np.int64)
+
+        rows = np.flatnonzero(self.active[:used] & (score >= threshold))
+        rows = rows[np.lexsort((self.order[rows], -score[rows]))]
+        if limit:
+            rows = rows[:limit]
+        return [(self.row_ids[row], int(score[row])) for row in rows]
+
+    def __len__(self):
+        return len(self.rows)